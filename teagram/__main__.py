@@ -5,6 +5,7 @@ if sys.version_info < (3, 8, 0):
     sys.exit()
 
 import argparse
+import time
 
 parser = argparse.ArgumentParser()
 
@@ -16,9 +17,29 @@ parser.add_argument("--debug", "-d", action="store_true")
 
 parser.add_argument("--hot-reload", "-w", action="store_true")
 parser.add_argument("--port", "-p", type=int, required=False)
+parser.add_argument("--zygote", "-z", action="store_true")
+parser.add_argument("--profile-startup", action="store_true")
 
 if __name__ == "__main__":
-    from .main import Main
+    arguments = parser.parse_args()
 
-    main = Main(parser.parse_args())
-    main.start()
+    if arguments.profile_startup:
+        from . import init_time
+        from .profiler import profiler
+
+        profiler.enable(init_time)
+
+    if arguments.zygote:
+        from .zygote import Zygote
+
+        Zygote(arguments).run()
+    else:
+        from .profiler import profiler
+
+        start = time.perf_counter()
+        from .main import Main
+
+        profiler.record("imports", start, time.perf_counter())
+
+        main = Main(arguments)
+        main.start()
@@ -0,0 +1,100 @@
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+
+_MISSING = object()
+
+
+class BoundedStore:
+    """
+    Mapping with a capacity and a time to live. The least recently used
+    entry is evicted when the store is full, expired ones are dropped on
+    access and when new entries are added
+    """
+
+    def __init__(self, capacity: int, ttl: Optional[float] = None):
+        self.capacity = capacity
+        self.ttl = ttl
+
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return _MISSING
+
+        stored_at, value = entry
+        if self._expired(stored_at, time.monotonic()):
+            del self._data[key]
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return _MISSING
+
+        self._data.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def purge(self) -> None:
+        """
+        Drops expired entries from the least recently used end, ones used
+        since are dropped when accessed or evicted
+        """
+        if self.ttl is None:
+            return
+
+        now = time.monotonic()
+        while self._data:
+            key, (stored_at, _) = next(iter(self._data.items()))
+            if not self._expired(stored_at, now):
+                break
+
+            del self._data[key]
+            self.stats["expirations"] += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic(), value)
+
+        self.purge()
+        while len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and not self._expired(entry[0], time.monotonic())
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(list(self._data))
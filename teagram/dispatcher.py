@@ -3,7 +3,8 @@ from . import utils
 from types import FunctionType
 from inspect import getfullargspec, iscoroutine
 
-from pyrogram import filters
+from pyrogram import filters, raw
+from pyrogram import utils as pyrogram_utils
 
 from pyrogram.types import Message
 from pyrogram.client import Client
@@ -11,6 +12,7 @@ from pyrogram.client import Client
 from pyrogram.handlers import MessageHandler, EditedMessageHandler, RawUpdateHandler
 
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +24,14 @@ class Dispatcher:
         self.database = loader.database
         self.loader = loader
 
+        self._prefixes = None
+        self._command_matcher = None
+
+        self._catch_all_watchers = {}
+        self._handlers = []
+        self._chat_watchers = {}
+        self._keyword_watchers = {}
+
     async def check_filter(self, function: FunctionType, message: Message):
         filters = getattr(function, "_filters", None)
 
@@ -39,21 +49,169 @@ class Dispatcher:
 
         return True
 
+    def get_command_matcher(self):
+        """
+        Mirrors `utils.get_command`: prefixes are tried in the same order
+        and whitespace between the prefix and the command is allowed
+        """
+        prefixes = tuple(self.database.get("teagram", "prefix", ["."]))
+        if prefixes != self._prefixes:
+            self._prefixes = prefixes
+            self._command_matcher = re.compile(
+                "(?:%s)\\s*(\\S+)" % "|".join(map(re.escape, prefixes))
+            )
+
+        return self._command_matcher
+
+    def _watcher_hints(self, watcher):
+        chat_ids = getattr(watcher, "chat_ids", None)
+        keywords = getattr(watcher, "keywords", None)
+        if isinstance(keywords, str):
+            keywords = [keywords]
+
+        return chat_ids, tuple(keywords or ())
+
+    def index_watchers(self, watchers=None):
+        """
+        Splits watchers by their `chat_ids` / `keywords` hints so raw updates
+        can be checked without building a high-level `Message`.
+        Without arguments the whole index is rebuilt from the loader
+        """
+        if watchers is None:
+            self._catch_all_watchers = {}
+            self._chat_watchers = {}
+            self._keyword_watchers = {}
+
+            watchers = self.loader.watchers
+
+        for watcher in watchers:
+            chat_ids, keywords = self._watcher_hints(watcher)
+
+            if chat_ids:
+                for chat_id in chat_ids:
+                    self._chat_watchers.setdefault(chat_id, {})[watcher] = None
+            elif keywords:
+                self._keyword_watchers[watcher] = keywords
+            else:
+                self._catch_all_watchers[watcher] = None
+
+    def unindex_watchers(self, watchers):
+        for watcher in watchers:
+            chat_ids, _ = self._watcher_hints(watcher)
+
+            for chat_id in chat_ids or ():
+                chat_watchers = self._chat_watchers.get(chat_id, {})
+                chat_watchers.pop(watcher, None)
+                if not chat_watchers:
+                    self._chat_watchers.pop(chat_id, None)
+
+            self._keyword_watchers.pop(watcher, None)
+            self._catch_all_watchers.pop(watcher, None)
+
+    def get_watchers(self, chat_id, text):
+        watchers = list(self._catch_all_watchers)
+        watchers.extend(self._chat_watchers.get(chat_id, ()))
+
+        if text:
+            watchers.extend(
+                watcher
+                for watcher, keywords in self._keyword_watchers.items()
+                if any(keyword in text for keyword in keywords)
+            )
+
+        return watchers
+
+    def is_command(self, text: str) -> bool:
+        if not text:
+            return False
+
+        match = self.get_command_matcher().match(text)
+        if not match:
+            return False
+
+        command = match.group(1).lower()
+        command = self.loader.aliases.get(command, command)
+
+        return command.lower() in self.loader.commands
+
+    def should_parse(self, update) -> bool:
+        message = getattr(update, "message", None)
+        if message is None:
+            return True
+
+        if self._catch_all_watchers or self.has_foreign_handlers():
+            return True
+
+        text = getattr(message, "message", None)
+        if self.is_command(text):
+            return True
+
+        peer_id = getattr(message, "peer_id", None)
+        chat_id = pyrogram_utils.get_peer_id(peer_id) if peer_id else None
+
+        return bool(self.get_watchers(chat_id, text))
+
+    def has_foreign_handlers(self) -> bool:
+        """
+        Handlers added straight to the client (`client.add_handler`,
+        `@client.on_message`) need every parsed update
+        """
+        for handlers in getattr(self.client.dispatcher, "groups", {}).values():
+            for handler in handlers:
+                if handler not in self._handlers and not isinstance(
+                    handler, RawUpdateHandler
+                ):
+                    return True
+
+        return False
+
+    def install_prefilter(self):
+        """
+        Wraps pyrogram's message parsers so `Message` objects are only built
+        for updates that a command or watcher can consume
+        """
+        parsers = getattr(self.client.dispatcher, "update_parsers", {})
+        for update_type in (
+            raw.types.UpdateNewMessage,
+            raw.types.UpdateNewChannelMessage,
+            raw.types.UpdateEditMessage,
+            raw.types.UpdateEditChannelMessage,
+        ):
+            parser = parsers.get(update_type)
+            if not parser or getattr(parser, "__prefiltered__", False):
+                continue
+
+            parsers[update_type] = self._wrap_parser(parser)
+
+    def _wrap_parser(self, parser):
+        async def prefiltered_parser(update, users, chats):
+            if not self.should_parse(update):
+                return None, type(None)
+
+            return await parser(update, users, chats)
+
+        prefiltered_parser.__prefiltered__ = True
+        return prefiltered_parser
+
     async def load(self):
-        self.client.add_handler(
-            handler=MessageHandler(self.handle_message, filters.all)
-        )
-        self.client.add_handler(
-            handler=EditedMessageHandler(self.handle_message, filters.all)
-        )
-        self.client.add_handler(
-            handler=RawUpdateHandler(self.handle_raw_update, filters.all)
-        )
+        self.index_watchers()
+        self.install_prefilter()
+
+        self._handlers = [
+            MessageHandler(self.handle_message, filters.all),
+            EditedMessageHandler(self.handle_message, filters.all),
+            RawUpdateHandler(self.handle_raw_update, filters.all),
+        ]
+        for handler in self._handlers:
+            self.client.add_handler(handler=handler)
 
         return True
 
     async def handle_watchers(self, message: Message):
-        for watcher in self.loader.watchers:
+        chat_id = message.chat.id if message.chat else None
+        text = message.text or message.caption
+
+        for watcher in self.get_watchers(chat_id, text):
             try:
                 if await self.check_filter(watcher, message):
                     await watcher(message)
@@ -61,6 +219,15 @@ class Dispatcher:
                 logger.exception("Error occurred while handling watcher")
 
     async def handle_message(self, _, message: Message):
+        self.loader.run_deferred()
+
+        with self.loader.translator.use(
+            message.chat.id if message.chat else None,
+            message.from_user.id if message.from_user else None,
+        ):
+            return await self._handle_message(message)
+
+    async def _handle_message(self, message: Message):
         await self.handle_watchers(message)
 
         _, command, args = utils.get_command(self.database, message)
@@ -93,7 +260,7 @@ class Dispatcher:
         return message
 
     async def handle_raw_update(self, update, *args, **kwargs):
-        for handler in self.loader.raw_handlers:
+        for handler in tuple(self.loader.raw_handlers):
             try:
                 if await self.check_filter(handler, update):
                     await handler(update, *args, **kwargs)
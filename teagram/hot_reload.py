@@ -1,28 +1,109 @@
 import asyncio
+import hashlib
 import logging
+import time
 
 from pathlib import Path
-from watchfiles import awatch
+from watchfiles import awatch, Change
+
+from .utils import hash_sources
 
 
 class ModulesWatchdog:
-    def __init__(self, loader, paths: list):
+    # Editors usually emit several events (write, chmod, rename) per save
+    DEBOUNCE = 0.5
+
+    def __init__(self, loader, paths: list, hashes: dict = None):
+        """
+        `hashes` are the sources as they were loaded, edits made before the
+        watchdog started are reloaded when it does
+        """
         self.loader = loader
         self.paths = paths
         self.task = None
 
+        self._pending = {}
+        self._hashes = hashes
+
+    def _hash(self, file_path: Path) -> str:
+        return hashlib.sha256(file_path.read_bytes()).hexdigest()
+
+    def _schedule(self, change: Change, file_path: str):
+        pending = self._pending.pop(file_path, None)
+        if pending:
+            pending.cancel()
+
+        self._pending[file_path] = asyncio.create_task(
+            self._debounced(change, file_path)
+        )
+
     async def _watch(self):
+        current = hash_sources(self.paths)
+        if self._hashes is None:
+            self._hashes = current
+
+        for file_path in self._hashes.keys() | current.keys():
+            if file_path not in current:
+                self._schedule(Change.deleted, file_path)
+            elif self._hashes.get(file_path) != current[file_path]:
+                self._schedule(Change.modified, file_path)
+
         async for changes in awatch(*[str(p) for p in self.paths], recursive=False):
             for change, file_path in changes:
-                if not file_path.endswith(".py"):
-                    continue
+                if file_path.endswith(".py"):
+                    self._schedule(change, file_path)
+
+    async def _debounced(self, change: Change, file_path: str):
+        await asyncio.sleep(self.DEBOUNCE)
+        self._pending.pop(file_path, None)
 
-                file_path_obj = Path(file_path)
-                module_name = self.loader._get_module_path(file_path_obj)
+        try:
+            await self._handle(change, file_path)
+        except Exception:
+            logging.exception(f"Failed to reload {file_path}")
 
-                if module_name:
-                    logging.debug(f"Detected change in {module_name}")
-                    await self.loader.load_module(module_name, file_path, watchdog=True)
+    async def _handle(self, change: Change, file_path: str):
+        file_path_obj = Path(file_path)
+        module_name = self.loader._get_module_path(file_path_obj)
+        if not module_name:
+            return
+
+        start = time.perf_counter()
+        if change == Change.deleted or not file_path_obj.exists():
+            self._hashes.pop(file_path, None)
+
+            module = next(
+                (
+                    module
+                    for module in self.loader.modules
+                    if module.__class__.__module__ == module_name
+                    or getattr(module, "__lazy__", (None,))[0] == module_name
+                ),
+                None,
+            )
+            if module:
+                await self.loader._remove_module(module)
+                logging.info(
+                    f"Unloaded {module_name} ({(time.perf_counter() - start) * 1000:.1f}ms)"
+                )
+
+            return
+
+        digest = self._hash(file_path_obj)
+        if self._hashes.get(file_path) == digest:
+            logging.debug(f"Skipping {module_name}, content is unchanged")
+            return
+
+        logging.debug(f"Detected change in {module_name}")
+        await self.loader.load_module(module_name, file_path, watchdog=True)
+
+        # Only after a successful reload, so saving the same content again
+        # retries a failed one
+        self._hashes[file_path] = digest
+
+        logging.info(
+            f"Reloaded {module_name} ({(time.perf_counter() - start) * 1000:.1f}ms)"
+        )
 
     def start(self):
         self.task = asyncio.create_task(self._watch())
@@ -34,3 +115,8 @@ class ModulesWatchdog:
             logging.debug("Watchdog stopped.")
 
             del self.task
+
+        for pending in self._pending.values():
+            pending.cancel()
+
+        self._pending.clear()
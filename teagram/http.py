@@ -0,0 +1,164 @@
+import asyncio
+import logging
+
+from typing import Any, Dict, Optional
+
+import aiohttp
+import ujson
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseTooLarge(Exception):
+    """Raised when a response body exceeds the configured size limit."""
+
+    pass
+
+
+class Response:
+    """
+    Fully read response, usable after its connection went back to the pool.
+    Mirrors the parts of `aiohttp.ClientResponse` modules use
+    """
+
+    def __init__(self, response: aiohttp.ClientResponse, body: bytes):
+        self.status = response.status
+        self.reason = response.reason
+        self.url = response.url
+        self.headers = response.headers
+        self.request_info = response.request_info
+        self.history = response.history
+        self.charset = response.charset
+        self.body = body
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = "strict") -> str:
+        return self.body.decode(encoding or self.charset or "utf-8", errors)
+
+    async def json(self, *, loads=ujson.loads, **_: Any) -> Any:
+        return loads(self.body)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise aiohttp.ClientResponseError(
+                self.request_info,
+                self.history,
+                status=self.status,
+                message=self.reason or "",
+                headers=self.headers,
+            )
+
+
+class HTTPClient:
+    """
+    Pooled HTTP session shared by the core and modules (`self.http`).
+    Keeps connections, DNS cache and TLS sessions between requests
+    """
+
+    LIMIT = 100
+    LIMIT_PER_HOST = 10
+    TIMEOUT = 30
+    RETRIES = 2
+    # Requests with other methods are only retried when `retries` is passed
+    IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    MAX_RESPONSE_SIZE = 20 * 1024 * 1024
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "retries": 0,
+        }
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection_create)
+            trace.on_connection_reuseconn.append(self._on_connection_reuse)
+
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.LIMIT,
+                    limit_per_host=self.LIMIT_PER_HOST,
+                    ttl_dns_cache=300,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.TIMEOUT),
+                trace_configs=[trace],
+            )
+
+        return self._session
+
+    async def _on_connection_create(self, *_):
+        self.stats["new_connections"] += 1
+
+    async def _on_connection_reuse(self, *_):
+        self.stats["reused_connections"] += 1
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        max_size: Optional[int] = None,
+        retries: Optional[int] = None,
+        **kwargs: Any,
+    ) -> Response:
+        """
+        Performs a request with retries on connection errors and retryable
+        statuses, non-idempotent methods like POST only retry when asked to
+        with `retries`. The body is read (up to `max_size` bytes) before
+        returning, so the response can be used after the connection is released
+        """
+        max_size = self.MAX_RESPONSE_SIZE if max_size is None else max_size
+        if retries is None:
+            retries = self.RETRIES if method.upper() in self.IDEMPOTENT_METHODS else 0
+
+        for attempt in range(retries + 1):
+            self.stats["requests"] += 1
+            try:
+                async with self.session.request(method, url, **kwargs) as response:
+                    if response.status in self.RETRY_STATUSES and attempt < retries:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info,
+                            response.history,
+                            status=response.status,
+                        )
+
+                    if (response.content_length or 0) > max_size:
+                        raise ResponseTooLarge(url)
+
+                    body = bytearray()
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        body.extend(chunk)
+                        if len(body) > max_size:
+                            raise ResponseTooLarge(url)
+
+                    return Response(response, bytes(body))
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= retries:
+                    raise
+
+                self.stats["retries"] += 1
+                await asyncio.sleep(0.5 * 2**attempt)
+
+    async def get(self, url: str, **kwargs: Any) -> Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+        logger.debug(f"HTTP client closed, stats: {self.stats}")
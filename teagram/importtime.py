@@ -0,0 +1,62 @@
+import argparse
+import os
+import subprocess
+import sys
+
+from typing import List, Tuple
+
+# Budget for the cumulative import time of `teagram.main`, in milliseconds
+IMPORT_BUDGET = 1500
+
+BASE_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def measure(module: str = "teagram.main") -> Tuple[float, List[Tuple[float, str]]]:
+    """
+    Imports `module` in a fresh interpreter with `-X importtime`, returns its
+    cumulative import time and self times of every imported module, in ms
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_PATH,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"Failed to import {module}:\n{result.stderr}")
+
+    total, modules = 0.0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        if not self_time.strip().isdigit():
+            continue  # header
+
+        modules.append((int(self_time) / 1000, name.strip()))
+        if name.strip() == module:
+            total = int(cumulative) / 1000
+
+    return total, sorted(modules, reverse=True)
+
+
+def check(budget: float = IMPORT_BUDGET, module: str = "teagram.main", top: int = 15) -> bool:
+    total, modules = measure(module)
+
+    print(f"{module}: {total:.1f}ms (budget {budget:.0f}ms)")
+    for self_time, name in modules[:top]:
+        print(f"{self_time:10.1f}ms  {name}")
+
+    return total <= budget
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fails if a cold import of teagram takes longer than the budget"
+    )
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET, help="budget in ms")
+    parser.add_argument("--module", default="teagram.main")
+    arguments = parser.parse_args()
+
+    sys.exit(0 if check(arguments.budget, arguments.module) else 1)
@@ -0,0 +1,159 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import re
+import time
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import ujson
+
+from ..cache import BoundedStore
+from ..utils import BASE_PATH, random_id
+
+CALLBACKS_PATH = os.path.join(BASE_PATH, ".cache", "callbacks.json")
+
+# Prefix of `callback_data` of buttons with a registered callback
+CALLBACK_PREFIX = "#"
+# Registered ids: the prefix and 11 characters, urlsafe base64 of an 8 byte
+# digest for persisted callbacks or `random_id(11)` for in-memory ones
+CALLBACK_ID_PATTERN = re.compile(re.escape(CALLBACK_PREFIX) + r"[A-Za-z0-9_-]{11}")
+
+logger = logging.getLogger(__name__)
+
+Callback = Tuple[Callable, list, dict]
+
+
+class CallbackRegistry:
+    """
+    Issues short ids for button callbacks. Module methods with JSON-friendly
+    arguments are persisted as (module, handler, args) and resolved by name
+    after a restart, other callbacks live in memory only
+    """
+
+    SAVE_DELAY = 1
+
+    def __init__(self, loader: Any, capacity: int, ttl: float, path: str = CALLBACKS_PATH):
+        self._loader = loader
+        self.capacity = capacity
+        self.ttl = ttl
+        self.path = path
+
+        self.memory = BoundedStore(capacity, ttl)
+        self.stats: Dict[str, int] = {"persisted": 0, "expired": 0}
+
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                self.entries: Dict[str, Dict[str, Any]] = ujson.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self.purge()
+
+    def _make_id(self, payload: str) -> str:
+        digest = hashlib.blake2b(payload.encode(), digest_size=8).digest()
+        return CALLBACK_PREFIX + base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+    def _describe(self, callback: Callable, args: list, kwargs: dict) -> Optional[Dict[str, Any]]:
+        module = getattr(callback, "__self__", None)
+        if module is None or module is not self._loader.lookup(module.__class__.__name__):
+            return None
+
+        try:
+            ujson.dumps([args, kwargs])
+        except (TypeError, OverflowError):
+            return None
+
+        return {
+            "module": module.__class__.__name__,
+            "handler": callback.__name__,
+            "args": list(args),
+            "kwargs": dict(kwargs),
+        }
+
+    def register(self, callback: Callable, args: list, kwargs: dict) -> str:
+        entry = self._describe(callback, args, kwargs)
+        if entry is None:
+            callback_id = CALLBACK_PREFIX + random_id(11)
+            self.memory[callback_id] = (callback, args, kwargs)
+            return callback_id
+
+        callback_id = self._make_id(ujson.dumps(entry, sort_keys=True))
+        if callback_id not in self.entries:
+            self.stats["persisted"] += 1
+
+        self.entries[callback_id] = {**entry, "expires": time.time() + self.ttl}
+        self._schedule_save()
+
+        return callback_id
+
+    async def resolve(self, callback_id: str) -> Optional[Callback]:
+        """
+        Persisted callbacks are looked up by name every time, so they point
+        to the current instance of the module after reloads
+        """
+        callback = self.memory.get(callback_id)
+        if callback is not None:
+            return callback
+
+        entry = self.entries.get(callback_id)
+        if entry is None:
+            return None
+
+        if entry["expires"] < time.time():
+            self.entries.pop(callback_id)
+            self.stats["expired"] += 1
+            self._schedule_save()
+            return None
+
+        module = self._loader.lookup(entry["module"])
+        if module is None:
+            return None
+
+        if getattr(module, "__lazy__", None):
+            module = await self._loader.activate_lazy_module(module)
+
+        handler = getattr(module, entry["handler"], None)
+        if not callable(handler):
+            return None
+
+        return handler, entry["args"], entry["kwargs"]
+
+    def purge(self) -> None:
+        now = time.time()
+        expired = [key for key, entry in self.entries.items() if entry["expires"] < now]
+        for key in expired:
+            del self.entries[key]
+
+        # Keep the ones that expire last
+        overflow = len(self.entries) - self.capacity
+        if overflow > 0:
+            for key in sorted(self.entries, key=lambda k: self.entries[k]["expires"])[:overflow]:
+                del self.entries[key]
+
+        self.stats["expired"] += len(expired)
+
+    def _schedule_save(self) -> None:
+        if self._save_handle is not None:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.save()
+
+        self._save_handle = loop.call_later(self.SAVE_DELAY, self.save)
+
+    def save(self) -> None:
+        self._save_handle = None
+        self.purge()
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as file:
+                ujson.dump(self.entries, file)
+        except OSError:
+            logger.exception("Failed to save inline callbacks")
@@ -28,8 +28,9 @@ class InlineDispatcher(TokenManager, EventManager):
 
         self.bot: Bot = None
         self.dispatcher: Dispatcher = None
+        self.ready = asyncio.Event()
 
-        self._forms = {}
+        self._create_stores(self.database)
 
     async def on_startup(self, *_):
         logging.debug("Inline dispatcher started")
@@ -48,6 +49,7 @@ class InlineDispatcher(TokenManager, EventManager):
         try:
             await self.bot.delete_webhook(drop_pending_updates=True)
 
+            self.dispatcher.update.middleware(self._language_middleware)
             self.dispatcher.message.register(self._message_handler)
             self.dispatcher.callback_query.register(self._callback_handler)
             self.dispatcher.inline_query.register(self._inline_handler)
@@ -57,6 +59,7 @@ class InlineDispatcher(TokenManager, EventManager):
         except TelegramUnauthorizedError:
             return await self.restart()
 
+        self.ready.set()
         return self.bot
 
     async def restart(self):
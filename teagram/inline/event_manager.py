@@ -1,6 +1,7 @@
 from aiogram import types as aio_types
 
 from ..types import ABCLoader, Module
+from .callbacks import CALLBACK_ID_PATTERN
 from .types import Form
 
 from types import FunctionType
@@ -36,6 +37,14 @@ class EventManager(Form):
 
         return True
 
+    async def _language_middleware(self, handler, event: aio_types.Update, data: dict):
+        """Translates in the language of the chat/user the update came from"""
+        chat, user = data.get("event_chat"), data.get("event_from_user")
+        with self._loader.translator.use(
+            chat.id if chat else None, user.id if user else None
+        ):
+            return await handler(event, data)
+
     async def _message_handler(self, message: aio_types.Message):
         logger.debug("Handling message from %s", message.from_user.model_dump_json())
 
@@ -60,8 +69,9 @@ class EventManager(Form):
             callback_query.from_user.model_dump_json(),
         )
 
-        if callback_data in self._forms:
-            callback, args, kwargs = self._forms[callback_data]
+        registered = await self._callbacks.resolve(callback_data)
+        if registered:
+            callback, args, kwargs = registered
             if await self._check_filters(callback, None, callback_query):
                 try:
                     return await callback(callback_query, *args, **kwargs)
@@ -72,6 +82,13 @@ class EventManager(Form):
 
             return callback_query
 
+        if callback_data and CALLBACK_ID_PATTERN.fullmatch(callback_data):
+            # The form was evicted or has expired
+            await callback_query.answer(
+                self._loader.translator.get("inline", "form_expired")
+            )
+            return callback_query
+
         handler = self._loader.callback_handlers.get(callback_data)
         if handler:
             if await self._check_filters(handler, getattr(handler, "__self__", None), callback_query):
@@ -82,7 +99,26 @@ class EventManager(Form):
 
                 return callback_query
 
+        routed = self._loader.callback_routes.match(callback_data) if callback_data else None
+        if routed:
+            handler, payload = routed
+            if await self._check_filters(handler, getattr(handler, "__self__", None), callback_query):
+                try:
+                    if len(inspect.getfullargspec(handler).args) > 2:
+                        await handler(callback_query, payload)
+                    else:
+                        await handler(callback_query)
+                except Exception:
+                    logger.exception("Error occurred while handling callback query")
+
+                return callback_query
+
+        # Unstructured data or rejected by the routed handler,
+        # left to other handlers' own filters
         for func in self._loader.callback_handlers.copy().values():
+            if routed and func == routed[0]:
+                continue
+
             if not await self._check_filters(func, getattr(func, "__self__", None), callback_query):
                 continue
 
@@ -115,8 +151,7 @@ class EventManager(Form):
         if func:
             if await self._check_filters(func, getattr(func, "__self__", None), inline_query):
                 try:
-                    result = await func(inline_query)
-                    await self._handle_inline_result(inline_query, result)
+                    await self._handle_inline_result(inline_query, func)
                 except Exception:
                     logger.exception("Error occurred while handling inline query")
         else:
@@ -1,7 +1,12 @@
+import asyncio
+import hashlib
+import inspect
 import typing
+import weakref
 from enum import Enum
 from aiogram import types as aio_types
 from aiogram.types import (
+    InlineQueryResult,
     InlineQueryResultArticle,
     InlineQueryResultPhoto,
     InlineQueryResultGif,
@@ -12,9 +17,14 @@ from aiogram.types import (
 )
 from pyrogram.types import Message as PyroMessage
 from pyrogram.enums import ParseMode
+from pyrogram.errors import RPCError
 
+import ujson
+
+from ..cache import BoundedStore
 from ..utils import FileLike, random_id
 from ..types import ABCLoader
+from .callbacks import CallbackRegistry
 
 
 class FormType(Enum):
@@ -23,8 +33,64 @@ class FormType(Enum):
 
 
 class Form:
+    # Forms are only needed until their inline query is answered, callbacks
+    # live as long as users may press the buttons. Capacities can be changed
+    # with `inline_forms_capacity` / `inline_callbacks_capacity` in the database
+    FORMS_CAPACITY = 500
+    FORMS_TTL = 60 * 60
+    CALLBACKS_CAPACITY = 5000
+    CALLBACKS_TTL = 7 * 24 * 60 * 60
+
+    # Forms with the same content reuse the query results Telegram already
+    # has, kept a bit shorter than the bot asks Telegram to cache them
+    FORM_CACHE_TIME = 300
+    RESULTS_TTL = 240
+
+    # Telegram accepts up to 50 results per answer
+    INLINE_PAGE_SIZE = 50
+    INLINE_STATES_CAPACITY = 100
+    INLINE_STATES_TTL = 5 * 60
+    INLINE_CACHE_SIZE = 100
+
     def __init__(self, loader: ABCLoader):
         self._loader = loader
+        self._create_stores(loader.database)
+
+    def _create_stores(self, database) -> None:
+        forms_capacity = database.get(
+            "teagram", "inline_forms_capacity", self.FORMS_CAPACITY
+        )
+        callbacks_capacity = database.get(
+            "teagram", "inline_callbacks_capacity", self.CALLBACKS_CAPACITY
+        )
+
+        self._forms = BoundedStore(forms_capacity, self.FORMS_TTL)
+        self._context = BoundedStore(forms_capacity, self.FORMS_TTL)
+        self._results = BoundedStore(forms_capacity, self.RESULTS_TTL)
+        self._inline_states = BoundedStore(
+            self.INLINE_STATES_CAPACITY, self.INLINE_STATES_TTL
+        )
+        self._inline_caches: typing.MutableMapping[
+            typing.Callable, BoundedStore
+        ] = weakref.WeakKeyDictionary()
+        self._callbacks = CallbackRegistry(
+            self._loader, callbacks_capacity, self.CALLBACKS_TTL
+        )
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, int]]:
+        return {
+            "forms": {"size": len(self._forms), **self._forms.stats},
+            "results": {"size": len(self._results), **self._results.stats},
+            "inline_cache": {
+                counter: sum(cache.stats[counter] for cache in self._inline_caches.values())
+                for counter in ("hits", "misses", "evictions", "expirations")
+            },
+            "callbacks": {
+                "size": len(self._callbacks.entries),
+                **self._callbacks.memory.stats,
+                **self._callbacks.stats,
+            },
+        }
 
     async def answer(
         self,
@@ -39,23 +105,12 @@ class Form:
         audio: typing.Optional[FileLike] = None,
         parse_mode: typing.Optional[ParseMode] = ParseMode.HTML,
     ) -> PyroMessage:
-        form_id = random_id()
-
-        if not hasattr(self, "_forms"):
-            self._forms = {}
-        if not hasattr(self, "_context"):
-            self._context = {}
-
-        # Store only necessary message attributes
-        self._context[form_id] = {
-            "chat_id": message.chat.id,
-            "message_id": getattr(message, "message_id", getattr(message, "id", None)),
-            "reply_to_message_id": (
-                getattr(message, "reply_to_message_id", None)
-                if isinstance(message, PyroMessage)
-                else getattr(getattr(message, "reply_to_message", None), "message_id", None)
-            ),
-        }
+        chat_id = message.chat.id
+        reply_to_message_id = (
+            getattr(message, "reply_to_message_id", None)
+            if isinstance(message, PyroMessage)
+            else getattr(getattr(message, "reply_to_message", None), "message_id", None)
+        )
 
         media = {
             k: v
@@ -68,14 +123,43 @@ class Form:
             }.items()
             if v is not None
         }
+        reply_markup = self._normalize_reply_markup(reply_markup)
+
+        key = self._form_key(text, reply_markup, parse_mode, media)
+        cached = self._results.get(key) if key else None
+        if cached:
+            query_id, result_id = cached
+            try:
+                return await self._loader.client.send_inline_bot_result(
+                    chat_id, query_id, result_id, reply_to_message_id=reply_to_message_id
+                )
+            except RPCError:
+                # Telegram no longer knows the query, make a new one
+                self._results.pop(key)
+
+        form_id = random_id()
 
-        self._forms[form_id] = {
+        # Store only necessary message attributes
+        self._context[form_id] = {
+            "chat_id": chat_id,
+            "message_id": getattr(message, "message_id", getattr(message, "id", None)),
+            "reply_to_message_id": reply_to_message_id,
+        }
+
+        form = {
             "type": FormType.FORM,
             "text": text,
             "reply_markup": reply_markup,
             "parse_mode": parse_mode,
             **media,
         }
+        form["result"] = self._build_form_result(form)
+        self._forms[form_id] = form
+
+        # Inline bot is brought up concurrently with modules at startup
+        await self.ready.wait()
+        if self.bot is None:
+            raise RuntimeError("Inline bot failed to start, see logs")
 
         bot_username = getattr(self, "bot_username", None)
         if not bot_username:
@@ -87,18 +171,44 @@ class Form:
             bot_username, form_id
         )
 
+        context = self._context.pop(form_id)
+        if context is None:
+            raise ValueError("Form expired before it was sent.")
+
         if bot_results and bot_results.results:
+            if key:
+                self._results[key] = (bot_results.query_id, bot_results.results[0].id)
+
             return await self._loader.client.send_inline_bot_result(
-                self._context[form_id]["chat_id"],
+                context["chat_id"],
                 bot_results.query_id,
                 bot_results.results[0].id,
-                reply_to_message_id=self._context[form_id]["reply_to_message_id"],
+                reply_to_message_id=context["reply_to_message_id"],
             )
         else:
             raise ValueError("No inline results returned by bot.")
 
+    def _form_key(self, text, reply_markup, parse_mode, media) -> typing.Optional[str]:
+        """Hash of the form content, `None` if it can't be reused (in-memory media)"""
+        if not all(isinstance(value, str) for value in media.values()):
+            return None
+
+        try:
+            content = ujson.dumps(
+                [text, reply_markup, str(parse_mode), media], sort_keys=True
+            )
+        except (TypeError, OverflowError):
+            return None
+
+        return hashlib.sha256(content.encode()).hexdigest()
+
     async def _form_inline_handler(self, inline_query: aio_types.InlineQuery, form: typing.Dict):
-        normalized_markup = self._normalize_reply_markup(form.get("reply_markup"))
+        result = form.get("result") or self._build_form_result(form)
+        await inline_query.answer(results=[result], cache_time=self.FORM_CACHE_TIME)
+
+    def _build_form_result(self, form: typing.Dict):
+        """Built once when the form is created, not on every inline query"""
+        normalized_markup = form.get("reply_markup")
         base_text = form.get("text", "")
         parse_mode = "html"
         input_message_content = InputTextMessageContent(message_text=base_text, parse_mode=parse_mode)
@@ -166,26 +276,96 @@ class Form:
                 reply_markup=normalized_markup
             )
 
-        await inline_query.answer(results=[result], cache_time=30)
+        return result
 
-    async def _handle_inline_result(self, inline_query: aio_types.InlineQuery, func_results: typing.List[typing.Dict]):
-        results = []
-        for r in func_results:
-            msg_text = r.get("text") or r.get("message", "")
-            content = InputTextMessageContent(
-                message_text=msg_text,
-                parse_mode="html"
-            )
-            results.append(
-                InlineQueryResultArticle(
-                    id=random_id(),
-                    title=r.get("title", "Teagram"),
-                    description=msg_text,
-                    input_message_content=content,
-                    reply_markup=self._normalize_reply_markup(r.get("reply_markup"))
-                )
+    async def _handle_inline_result(self, inline_query: aio_types.InlineQuery, func: typing.Callable):
+        """
+        Answers with one page of the handler's results. Handlers may return a
+        list or be async generators, which are only advanced as far as the
+        user scrolls. The state is kept per user and query between pages
+        """
+        key = (inline_query.from_user.id, inline_query.query)
+        page = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+
+        state = self._inline_states.get(key) if page else None
+        if state is None:
+            cache = self._get_inline_cache(func)
+            cache_key = (inline_query.from_user.id, " ".join(inline_query.query.split()))
+            state = cache.get(cache_key) if cache is not None else None
+
+        if state is None:
+            source = func(inline_query)
+            if inspect.isawaitable(source):
+                source = await source
+
+            # The lock keeps concurrent queries sharing the state from
+            # advancing the generator at the same time
+            if inspect.isasyncgen(source):
+                state = {"source": source, "results": [], "lock": asyncio.Lock()}
+            else:
+                state = {"source": None, "results": list(source or []), "lock": None}
+
+            if cache is not None:
+                cache[cache_key] = state
+
+        self._inline_states[key] = state
+
+        # One result past the page tells whether there is a next one
+        end = (page + 1) * self.INLINE_PAGE_SIZE
+        if state["lock"] is not None:
+            async with state["lock"]:
+                while state["source"] is not None and len(state["results"]) <= end:
+                    try:
+                        state["results"].append(await state["source"].__anext__())
+                    except StopAsyncIteration:
+                        state["source"] = None
+
+        next_offset = str(page + 1) if len(state["results"]) > end else ""
+        if not next_offset:
+            self._inline_states.pop(key, None)
+
+        await inline_query.answer(
+            results=[
+                self._build_inline_result(result)
+                for result in state["results"][page * self.INLINE_PAGE_SIZE:end]
+            ],
+            cache_time=getattr(func, "cache_time", 30),
+            is_personal=getattr(func, "is_personal", False),
+            next_offset=next_offset,
+        )
+
+    def _get_inline_cache(self, func: typing.Callable) -> typing.Optional[BoundedStore]:
+        """Result cache of a handler with `cache_ttl` set, `None` otherwise"""
+        ttl = getattr(func, "cache_ttl", None)
+        if not ttl:
+            return None
+
+        # Keyed by the plain function, so a reloaded module starts fresh
+        function = getattr(func, "__func__", func)
+        cache = self._inline_caches.get(function)
+        if cache is None:
+            cache = self._inline_caches[function] = BoundedStore(
+                getattr(func, "cache_size", self.INLINE_CACHE_SIZE), ttl
             )
-        await inline_query.answer(results=results, cache_time=30)
+
+        return cache
+
+    def _build_inline_result(self, result: typing.Any):
+        if isinstance(result, InlineQueryResult):
+            return result
+
+        msg_text = result.get("text") or result.get("message", "")
+        content = InputTextMessageContent(
+            message_text=msg_text,
+            parse_mode="html"
+        )
+        return InlineQueryResultArticle(
+            id=random_id(),
+            title=result.get("title", "Teagram"),
+            description=msg_text,
+            input_message_content=content,
+            reply_markup=self._normalize_reply_markup(result.get("reply_markup"))
+        )
 
     def _normalize_reply_markup(self, reply_markup):
         if (
@@ -209,6 +389,4 @@ class Form:
         return reply_markup
 
     def _register_callback(self, callback, args, kwargs):
-        callback_id = str(hash((callback, tuple(args), frozenset(kwargs.items()))))
-        self._forms[callback_id] = (callback, args, kwargs)
-        return callback_id
\ No newline at end of file
+        return self._callbacks.register(callback, args, kwargs)
\ No newline at end of file
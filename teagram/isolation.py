@@ -0,0 +1,405 @@
+import asyncio
+import base64
+import importlib
+import logging
+import os
+import sys
+
+from enum import Enum
+from pathlib import Path
+from types import MethodType
+from typing import Any, Dict, Optional
+
+import ujson
+
+from pyrogram.types import Object
+
+from .manifest import extract_manifest
+from .types import Module
+
+logger = logging.getLogger(__name__)
+
+# Modules whose enums may be sent by workers
+ENUM_MODULES = ("pyrogram.enums.",)
+
+
+def encode(value: Any) -> Any:
+    """Converts a value to something JSON can carry between processes"""
+    if isinstance(value, Enum):
+        cls = type(value)
+        return {"__enum__": [cls.__module__, cls.__qualname__, value.name]}
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    if isinstance(value, Object):
+        return ujson.loads(str(value))
+    if isinstance(value, dict):
+        return {str(k): encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [encode(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+
+    return repr(value)
+
+
+def decode_enum(module_name: str, qualname: str, name: str) -> Enum:
+    """
+    Workers are untrusted, only enums from known modules are looked up, so
+    they can't make this process import or read anything else
+    """
+    if not f"{module_name}.".startswith(ENUM_MODULES):
+        raise ValueError(f"Enums from {module_name} are not allowed")
+
+    cls = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        if part.startswith("_"):
+            raise ValueError(f"Invalid enum {qualname}")
+
+        cls = getattr(cls, part)
+
+    if not (isinstance(cls, type) and issubclass(cls, Enum)):
+        raise ValueError(f"{module_name}.{qualname} is not an enum")
+
+    return cls[name]
+
+
+def decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+
+    if "__enum__" in value:
+        return decode_enum(*value["__enum__"])
+    if "__bytes__" in value:
+        return base64.b64decode(value["__bytes__"])
+
+    return {k: decode(v) for k, v in value.items()}
+
+
+def forwarded(_) -> bool:
+    """
+    Filter of proxies whose module has its own filters, they are checked in
+    the worker, as the main process can't run them
+    """
+    return True
+
+
+def serialize_message(message: Any) -> Dict[str, Any]:
+    return {
+        "id": message.id,
+        "chat": {"id": message.chat.id if message.chat else None},
+        "from_user": {"id": message.from_user.id} if message.from_user else None,
+        "text": message.text,
+        "caption": message.caption,
+        "outgoing": message.outgoing,
+        "reply_to_message_id": message.reply_to_message_id,
+    }
+
+
+class ModuleWorker:
+    """
+    Runs a custom module in a separate process. The worker gets serialized
+    messages and proxies `client`/`database` calls back over its stdio pipes,
+    crashes are contained and the worker is restarted with backoff
+    """
+
+    MAX_RESTART_DELAY = 60
+    COMMAND_TIMEOUT = 300
+
+    # Client methods a worker may call, anything touching the session,
+    # the bot token or the client's state stays out of reach
+    CLIENT_METHODS = frozenset(
+        {
+            "send_message",
+            "edit_message_text",
+            "edit_message_caption",
+            "delete_messages",
+            "forward_messages",
+            "copy_message",
+            "send_photo",
+            "send_document",
+            "send_video",
+            "send_audio",
+            "send_voice",
+            "send_animation",
+            "send_sticker",
+            "send_reaction",
+            "send_chat_action",
+            "pin_chat_message",
+            "unpin_chat_message",
+            "read_chat_history",
+            "get_messages",
+            "get_chat",
+            "get_chat_member",
+            "get_chat_history",
+            "search_messages",
+            "get_users",
+        }
+    )
+    # Database methods a worker may call, only on the module's own section
+    DATABASE_METHODS = frozenset({"get", "set", "pop"})
+
+    def __init__(
+        self,
+        loader: Any,
+        module_name: str,
+        path: Path,
+        memory_limit: Optional[int] = None,
+    ):
+        self.loader = loader
+        self.module_name = module_name
+        self.path = path
+        self.memory_limit = memory_limit
+
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.module: Optional[Module] = None
+        self.section = self._find_section()
+
+        self._ready: Optional[asyncio.Future] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._write_lock = asyncio.Lock()
+
+        self._reader = None
+        self._stopped = False
+        self._restart_delay = 1
+
+    async def start(self) -> Module:
+        env = dict(os.environ)
+        if self.memory_limit:
+            env["TEAGRAM_WORKER_MEMORY"] = str(self.memory_limit)
+
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "teagram.worker",
+            self.module_name,
+            str(self.path),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=env,
+            limit=2**24,
+        )
+
+        self._ready = asyncio.get_running_loop().create_future()
+        self._reader = asyncio.create_task(self._read_loop())
+
+        await self._send(
+            {
+                "type": "init",
+                "me": encode(self.loader.client.me),
+                "database": self._database_snapshot(),
+                "section": self.section,
+            }
+        )
+        manifest = await asyncio.wait_for(self._ready, self.COMMAND_TIMEOUT)
+
+        if self.module is None:
+            self.module = self._create_module(manifest)
+            self.loader.registry.add(self.module)
+            self.loader.dispatcher.index_watchers(self.module.watchers)
+
+        self._restart_delay = 1
+        logger.info(f"Started {manifest['class_name']} in worker {self.process.pid}")
+
+        return self.module
+
+    def _find_section(self) -> str:
+        """Modules keep their data in the section named after their class"""
+        try:
+            manifest = extract_manifest(self.path.read_text(encoding="utf-8"))
+        except OSError:
+            manifest = None
+
+        return manifest["class_name"] if manifest else self.module_name
+
+    def _database_snapshot(self) -> Dict[str, Any]:
+        # Only the module's own data, secrets like the inline token and
+        # other modules' data stay in the main process
+        return {
+            self.section: dict(self.loader.database.data.get(self.section, {})),
+            "teagram": {
+                key: self.loader.database.get("teagram", key)
+                for key in ("language", "chat_languages", "prefix")
+            },
+        }
+
+    def _create_module(self, manifest: Dict[str, Any]) -> Module:
+        # The module name lets hot reload find the proxy by its file
+        module = type(
+            manifest["class_name"], (Module,), {"__module__": self.module_name}
+        )()
+        module.__origin__ = "<isolated>"
+        module.__worker__ = self
+        module.on_unload = self.stop
+
+        module.commands = {
+            name: self._proxy_command(module, name, info)
+            for name, info in manifest["commands"].items()
+        }
+        module.watchers = [
+            self._proxy_watcher(module, index, info)
+            for index, info in enumerate(manifest["watchers"])
+        ]
+        module.raw_handlers = []
+        module.inline_handlers = {}
+        module.callback_handlers = {}
+        module.message_handlers = []
+
+        return module
+
+    def _proxy_command(self, module: Module, command: str, info: Dict[str, Any]):
+        async def isolated_command(_, message, args):
+            await self.request(
+                {
+                    "type": "command",
+                    "name": command,
+                    "message": serialize_message(message),
+                    "args": args,
+                }
+            )
+
+        isolated_command.__doc__ = info["doc"]
+        isolated_command.alias = info["aliases"]
+        if info["filtered"]:
+            isolated_command._filters = forwarded
+
+        return MethodType(isolated_command, module)
+
+    def _proxy_watcher(self, module: Module, index: int, info: Dict[str, Any]):
+        """
+        Proxies carry the `chat_ids`/`keywords` hints of the watcher they
+        stand for, so the dispatcher indexes them like in-process ones
+        """
+        async def isolated_watcher(_, message):
+            await self._send(
+                {
+                    "type": "watcher",
+                    "index": index,
+                    "message": serialize_message(message),
+                }
+            )
+
+        isolated_watcher.chat_ids = info["chat_ids"]
+        isolated_watcher.keywords = info["keywords"]
+        if info["filtered"]:
+            isolated_watcher._filters = forwarded
+
+        return MethodType(isolated_watcher, module)
+
+    async def request(self, payload: Dict[str, Any]) -> Any:
+        if not self.process or self.process.returncode is not None:
+            raise RuntimeError(f"Worker of {self.module_name} is not running")
+
+        self._next_id += 1
+        payload["id"] = self._next_id
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[payload["id"]] = future
+
+        try:
+            await self._send(payload)
+            return await asyncio.wait_for(future, self.COMMAND_TIMEOUT)
+        finally:
+            self._pending.pop(payload["id"], None)
+
+    async def _send(self, payload: Dict[str, Any]) -> None:
+        async with self._write_lock:
+            self.process.stdin.write(ujson.dumps(payload).encode() + b"\n")
+            await self.process.stdin.drain()
+
+    async def _read_loop(self) -> None:
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                break
+
+            try:
+                payload = ujson.loads(line)
+            except ValueError:
+                logger.error(f"Malformed data from {self.module_name} worker")
+                continue
+
+            kind = payload.get("type")
+            if kind == "ready":
+                if not self._ready.done():
+                    self._ready.set_result(payload)
+            elif kind == "done":
+                future = self._pending.get(payload["id"])
+                if future and not future.done():
+                    if payload.get("error"):
+                        future.set_exception(RuntimeError(payload["error"]))
+                    else:
+                        future.set_result(None)
+            elif kind == "call":
+                asyncio.create_task(self._handle_call(payload))
+
+        await self._on_exit()
+
+    async def _handle_call(self, payload: Dict[str, Any]) -> None:
+        result, error = None, None
+        try:
+            target, method = payload["target"], payload["method"]
+            args = decode(payload.get("args", []))
+            kwargs = decode(payload.get("kwargs", {}))
+
+            if target == "client" and method in self.CLIENT_METHODS:
+                function = getattr(self.loader.client, method)
+            elif target == "database" and method in self.DATABASE_METHODS:
+                section = args[0] if args else kwargs.get("section")
+                if section != self.section:
+                    raise PermissionError(f"Section {section!r} is not available")
+
+                function = getattr(self.loader.database, method)
+            else:
+                raise PermissionError(f"{target}.{method} is not available")
+
+            result = function(*args, **kwargs)
+            if asyncio.iscoroutine(result):
+                result = await result
+
+            result = encode(result)
+        except Exception as exception:
+            error = f"{type(exception).__name__}: {exception}"
+
+        if "id" in payload:
+            await self._send(
+                {"type": "result", "id": payload["id"], "result": result, "error": error}
+            )
+
+    async def _on_exit(self) -> None:
+        code = await self.process.wait()
+
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(
+                    RuntimeError(f"Worker of {self.module_name} exited ({code})")
+                )
+
+        if self._ready and not self._ready.done():
+            self._ready.set_exception(
+                RuntimeError(f"Worker of {self.module_name} failed to start ({code})")
+            )
+
+        if self._stopped:
+            return
+
+        logger.error(
+            f"Worker of {self.module_name} exited with code {code}, "
+            f"restarting in {self._restart_delay}s"
+        )
+        await asyncio.sleep(self._restart_delay)
+        self._restart_delay = min(self._restart_delay * 2, self.MAX_RESTART_DELAY)
+
+        if not self._stopped:
+            try:
+                await self.start()
+            except Exception:
+                logger.exception(f"Failed to restart worker of {self.module_name}")
+
+    async def stop(self) -> None:
+        self._stopped = True
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            await self.process.wait()
@@ -1,17 +1,22 @@
 from typing import Final, List, Any, Type
+import asyncio
+import html
 import inspect
 import logging
 import sys
 import gc
+import time
 import os
 import re
 from dataclasses import asdict, fields
 from pathlib import Path
+from functools import partial
+from types import MethodType, ModuleType
 from importlib.machinery import ModuleSpec
 from importlib.util import spec_from_file_location, module_from_spec
 from pyrogram.handlers.handler import Handler
 
-from .utils import BASE_PATH
+from .utils import BASE_PATH, hash_sources, install_packages, is_package_installed
 from . import __version__
 from .dispatcher import Dispatcher
 from .types import (
@@ -22,11 +27,23 @@ from .types import (
     ABCLoader,
 )
 from .inline import InlineDispatcher
+from .manifest import ManifestCache, extract_manifest
+from .registry import ModuleRegistry
+from .isolation import ModuleWorker
+from .http import HTTPClient
+from .profiler import profiler
+from .module_store import ModuleStore
 from .translator import Translator, ModuleTranslator
 
 MODULES_PATH = Path(os.path.join(BASE_PATH, "teagram/modules"))
 CUSTOM_MODULES_PATH = Path(os.path.join(BASE_PATH, "teagram/custom_modules"))
 CUSTOM_MODULES_PATH.mkdir(parents=True, exist_ok=True)
+# Sources of isolated modules loaded from a message, workers import files
+WORKER_SOURCES_PATH = Path(BASE_PATH) / ".cache" / "workers"
+
+MODULE_LOAD_TIMEOUT: Final[float] = 30
+# Deferred work runs after the first update or after this many seconds
+DEFER_TIMEOUT: Final[float] = 10
 
 
 def set_attrs(func, *args, **kwargs):
@@ -50,6 +67,10 @@ def command(custom_filters=None, *args, **kwargs):
 
 
 def watcher(custom_filters=None, *args, **kwargs):
+    """
+    `chat_ids` and `keywords` kwargs narrow the watcher to specific chats or
+    texts, which lets the dispatcher skip building messages nobody needs
+    """
     def decorator(func):
         if custom_filters:
             setattr(func, "_filters", custom_filters)
@@ -67,6 +88,13 @@ def raw_handler(handler: Handler, *args, **kwargs):
 
 
 def inline_handler(custom_filters=None, *args, **kwargs):
+    """
+    Handlers return a list of results or are async generators yielding them,
+    results are sent in pages of 50. `cache_time` (default 30) and
+    `is_personal` kwargs are passed to Telegram with every page.
+    `cache_ttl` (seconds) keeps results per user and query in memory, up to
+    `cache_size` (default 100) queries
+    """
     def decorator(func):
         if custom_filters:
             setattr(func, "_filters", custom_filters)
@@ -77,6 +105,11 @@ def inline_handler(custom_filters=None, *args, **kwargs):
 
 
 def callback_handler(custom_filters=None, *args, **kwargs):
+    """
+    Handlers are routed by `callback_data` of `<module>:<handler>[:payload]`,
+    or of a custom `route` kwarg. Handlers taking a second argument get the
+    payload after the route
+    """
     def decorator(func):
         if custom_filters:
             setattr(func, "_filters", custom_filters)
@@ -129,22 +162,40 @@ class Loader(ABCLoader):
     def __init__(self, client: Any, database: Any, arguments: Any):
         self.client = client
         self.database = database
-        self.modules: List[Module] = []
+        self.registry = ModuleRegistry()
+        self.modules = self.registry
         self.core_modules: Final[List[str]] = [
             "eval", "help", "info", "manager", "terminal", "logs"
         ]
-        self.commands: dict = {}
-        self.aliases: dict = {}
-        self.raw_handlers: list = []
-        self.watchers: list = []
-        self.inline_handlers: dict = {}
-        self.callback_handlers: dict = {}
-        self.message_handlers: list = []
+        # Views over the registry, they are updated in place on load/unload
+        self.commands = self.registry.commands
+        self.aliases = self.registry.aliases
+        self.raw_handlers = self.registry.raw_handlers
+        self.watchers = self.registry.watchers
+        self.inline_handlers = self.registry.inline_handlers
+        self.callback_handlers = self.registry.callback_handlers
+        self.callback_routes = self.registry.callback_routes
+        self.message_handlers = self.registry.message_handlers
         self.dispatcher = Dispatcher(client, self)
         self.inline = InlineDispatcher(self)
-        self.translator = Translator(self.database)
+        with profiler.phase("translator load"):
+            self.translator = Translator(self.database)
+        self.manifests = ManifestCache()
+        self.http = HTTPClient()
+        self.module_store = ModuleStore(self.http)
+        self._install_lock = asyncio.Lock()
+
+        self._deferred: list = []
+        self._deferred_started = False
+
+        # on_load tasks that outlived their timeout
+        self._background: set = set()
+
+        # Sources as loaded, the watchdog starts later and compares with them
+        self._source_hashes = None
         if getattr(arguments, "hot_reload", False):
-            self.start_watchdog()
+            self._source_hashes = hash_sources([MODULES_PATH, CUSTOM_MODULES_PATH])
+            self.defer(self.start_watchdog)
 
     def get(self, key: str) -> str:
         return self.translator.get("loader", key)
@@ -162,7 +213,7 @@ class Loader(ABCLoader):
             from .hot_reload import ModulesWatchdog
 
             self.watch_manager = ModulesWatchdog(
-                self, [MODULES_PATH, CUSTOM_MODULES_PATH]
+                self, [MODULES_PATH, CUSTOM_MODULES_PATH], self._source_hashes
             )
             self.watch_manager.start()
 
@@ -175,14 +226,78 @@ class Loader(ABCLoader):
             return self.get("no_watchdog_library")
 
     async def load(self) -> None:
-        await self.load_modules()
+        # BotFather conversation and webhook reset overlap with module loading
+        inline = asyncio.create_task(self._load_inline())
+
+        with profiler.phase("modules"):
+            await self.load_modules()
+
+        with profiler.phase("dispatcher load"):
+            await self.dispatcher.load()
 
-        await self.dispatcher.load()
-        self.bot = await self.inline.load()
+        asyncio.get_running_loop().call_later(DEFER_TIMEOUT, self.run_deferred)
+        logging.info("Commands are available")
 
+        await inline
         logging.info("Loaded!")
 
+    async def _load_inline(self) -> None:
+        try:
+            with profiler.phase("InlineDispatcher.load"):
+                self.bot = await self.inline.load()
+        finally:
+            # Forms waiting for the bot fail instead of hanging forever
+            self.inline.ready.set()
+
+    def defer(self, callback: Any) -> None:
+        """
+        Postpones non-critical work until the first update is being handled,
+        so startup gets to serving commands sooner
+        """
+        if self._deferred_started:
+            asyncio.create_task(self._run_deferred_callback(callback))
+        else:
+            self._deferred.append(callback)
+
+    def run_deferred(self) -> None:
+        if self._deferred_started:
+            return
+
+        self._deferred_started = True
+        callbacks, self._deferred = self._deferred, []
+        for callback in callbacks:
+            asyncio.create_task(self._run_deferred_callback(callback))
+
+    async def _run_deferred_callback(self, callback: Any) -> None:
+        try:
+            result = callback()
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            logging.exception("Error occurred in deferred startup work")
+
+    async def reload_modules(self) -> float:
+        """
+        Soft restart: unloads every module and loads them again together with
+        translations, keeping the connected client and inline bot.
+        Returns elapsed time in seconds
+        """
+        start = time.perf_counter()
+
+        for module in list(self.modules):
+            try:
+                await self._remove_module(module)
+            except Exception:
+                logging.exception(f"Failed to unload {module.__class__.__name__}")
+
+        self.translator.fetch_translations()
+        await self.load_modules()
+
+        gc.collect()
+        return time.perf_counter() - start
+
     async def load_modules(self) -> None:
+        sources = []
         for path in MODULES_PATH.glob("*.py"):
             module_name = f"teagram.modules.{path.stem}"
             if path.stem.lower() not in self.core_modules:
@@ -191,22 +306,324 @@ class Loader(ABCLoader):
                 )
                 continue
 
-            await self.load_module(module_name, path, origin="<core>")
+            sources.append((module_name, path, "<core>"))
 
+        lazy_modules = self.database.get("teagram", "lazy_modules", True)
+
+        workers = []
         for path in CUSTOM_MODULES_PATH.glob("*.py"):
             module_name = f"teagram.custom_modules.{path.stem}"
-            await self.load_module(module_name, path, origin="<custom>")
+            manifest = self.manifests.get(path)
 
-    async def load_module(
+            if self.is_isolated(manifest, path):
+                workers.append(
+                    self.start_worker(module_name, path, manifest.get("memory_limit"))
+                )
+                continue
+
+            if lazy_modules and manifest and not manifest["eager"]:
+                self.register_lazy_module(module_name, path, manifest)
+                continue
+
+            sources.append((module_name, path, "<custom>"))
+
+        imported, _ = await asyncio.gather(
+            asyncio.gather(
+                *[
+                    self._import_with_timeout(module_name, path, origin)
+                    for module_name, path, origin in sources
+                ]
+            ),
+            asyncio.gather(*workers),
+        )
+
+        modules = self.resolve_dependencies(
+            [module for module in imported if module is not None]
+        )
+        activated = {
+            key: asyncio.get_running_loop().create_future()
+            for module in modules
+            for key in self.registry.get_names(module)
+        }
+
+        await asyncio.gather(
+            *[self._activate_with_timeout(module, activated) for module in modules]
+        )
+
+    def is_isolated(self, manifest: dict | None, path: Path | None = None) -> bool:
+        if not manifest:
+            return False
+
+        isolated_modules = self.database.get("teagram", "isolated_modules", [])
+        return bool(manifest.get("isolated")) or (
+            path is not None and path.stem in isolated_modules
+        )
+
+    async def start_worker(
+        self, module_name: str, path: Path, memory_limit: int | None = None
+    ) -> Module | None:
+        worker = ModuleWorker(self, module_name, path, memory_limit)
+        try:
+            return await worker.start()
+        except Exception:
+            logging.exception(f"Failed to start isolated module {path}")
+            await worker.stop()
+
+        return None
+
+    async def install_module_packages(self, manifest: dict | None) -> None:
+        packages = [
+            package
+            for package in (manifest or {}).get("packages", [])
+            if not is_package_installed(package)
+        ]
+        if not packages:
+            return
+
+        # pip can't run concurrently in the same environment
+        async with self._install_lock:
+            logging.info(f"Installing module requirements: {', '.join(packages)}")
+            if not await install_packages(packages):
+                raise ModuleException(
+                    self.get("requirements_install_fail").format(", ".join(packages))
+                )
+
+    async def _import_with_timeout(
+        self, module_name: str, path: Path, origin: str
+    ) -> Module | None:
+        """
+        Sources of custom modules are executed in a thread, so module-level
+        code can't use the event loop (see `Module`) and a timed out import
+        can't be stopped: the thread keeps running and the module is dropped
+        from `sys.modules`, but anything it does later is out of our hands.
+        Core modules are trusted and imported on the loop thread
+        """
+        try:
+            await self.install_module_packages(self.manifests.get(path))
+
+            with profiler.phase(f"{path.stem}: import"):
+                if origin == "<core>":
+                    module = self._exec_module(module_name, str(path), None, origin)
+                else:
+                    module = await asyncio.wait_for(
+                        asyncio.to_thread(
+                            self._exec_module, module_name, str(path), None, origin
+                        ),
+                        MODULE_LOAD_TIMEOUT,
+                    )
+
+            # Instantiated on the loop thread, `__init__` may use the event loop
+            return self._instantiate_module(module_name, module, origin)
+        except asyncio.TimeoutError:
+            sys.modules.pop(module_name, None)
+            logging.error(f"Importing {path} timed out, skipping it")
+        except Exception:
+            logging.exception(f"Failed to import {path}")
+
+        return None
+
+    async def _activate_with_timeout(self, module: Module, activated: dict) -> None:
+        name = module.__class__.__name__
+        try:
+            for requirement in module.requires:
+                required = self.lookup(requirement)
+                if getattr(required, "__lazy__", None):
+                    await self.activate_lazy_module(required)
+
+                future = activated.get(requirement.lower())
+                if future is not None and not await future:
+                    logging.error(
+                        f"Skipping {name}: required module {requirement} failed to load"
+                    )
+                    return self._set_activated(module, activated, False)
+
+            self.prepare_module(module)
+            with profiler.phase(f"{name}: on_load"):
+                await self._run_on_load(module)
+        except Exception:
+            logging.exception(f"Failed to load {name}")
+            return self._set_activated(module, activated, False)
+
+        self._set_activated(module, activated, True)
+
+    async def _run_on_load(self, module: Module) -> None:
+        """
+        Waits for `on_load` up to the module's `LOAD_TIMEOUT`. A slow one
+        isn't cancelled half-way, it keeps running in the background and
+        its errors are logged
+        """
+        name = module.__class__.__name__
+        task = asyncio.ensure_future(module.on_load())
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(task),
+                getattr(module, "LOAD_TIMEOUT", MODULE_LOAD_TIMEOUT),
+            )
+        except asyncio.TimeoutError:
+            logging.error(f"{name}.on_load timed out, it keeps running in the background")
+            self._background.add(task)
+            task.add_done_callback(partial(self._on_load_done, name))
+
+    def _on_load_done(self, name: str, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            logging.error(f"{name}.on_load failed", exc_info=task.exception())
+
+    def _set_activated(self, module: Module, activated: dict, result: bool) -> None:
+        for key in self.registry.get_names(module):
+            if not activated[key].done():
+                activated[key].set_result(result)
+
+    def resolve_dependencies(self, modules: List[Module]) -> List[Module]:
+        """
+        Orders modules so every module comes after the ones listed in its
+        `requires`, dropping modules with missing or circular requirements
+        """
+        known = {key for module in modules for key in self.registry.get_names(module)}
+        known.update(self.registry.names)
+
+        # Modules requiring a dropped one are dropped too, until nothing changes
+        pending = list(modules)
+        while True:
+            dropped = []
+            for module in pending:
+                missing = [r for r in module.requires if r.lower() not in known]
+                if missing:
+                    logging.error(
+                        f"Skipping {module.__class__.__name__}: required modules "
+                        f"{', '.join(missing)} are missing or failed to load"
+                    )
+                    dropped.append(module)
+
+            if not dropped:
+                break
+
+            for module in dropped:
+                pending.remove(module)
+                known.difference_update(self.registry.get_names(module))
+
+        ordered = []
+        resolved = set(self.registry.names)
+        while pending:
+            ready = [
+                module
+                for module in pending
+                if all(r.lower() in resolved for r in module.requires)
+            ]
+            if not ready:
+                for module in pending:
+                    logging.error(
+                        f"Skipping {module.__class__.__name__}: circular module requirements"
+                    )
+                break
+
+            for module in ready:
+                pending.remove(module)
+                ordered.append(module)
+                resolved.update(self.registry.get_names(module))
+
+        return ordered
+
+    def register_lazy_module(self, module_name: str, path: Path, manifest: dict) -> None:
+        """
+        Registers a placeholder with stub commands built from the module's
+        manifest, the module itself is imported on the first command call
+        """
+        module = type(manifest["class_name"], (Module,), {})()
+        module.__origin__ = "<custom>"
+        module.__lazy__ = (module_name, path)
+        module.__activated__ = None
+        module._activation_lock = asyncio.Lock()
+
+        module.commands = {
+            name: self._lazy_command(module, name, info)
+            for name, info in manifest["commands"].items()
+        }
+        module.watchers = []
+        module.raw_handlers = []
+        module.inline_handlers = {}
+        module.callback_handlers = {}
+        module.message_handlers = []
+
+        self.registry.add(module)
+        logging.debug(f"Deferred loading of {manifest['class_name']} ({path})")
+
+    def _lazy_command(self, module: Module, command: str, info: dict) -> Any:
+        async def lazy_command(_, message, args):
+            activated = await self.activate_lazy_module(module)
+
+            func = activated.commands.get(command)
+            if not func:
+                return
+
+            if len(inspect.getfullargspec(func).args) > 2:
+                return await func(message, args)
+
+            return await func(message)
+
+        lazy_command.__doc__ = info["doc"]
+        lazy_command.alias = info["aliases"]
+        return MethodType(lazy_command, module)
+
+    async def activate_lazy_module(self, module: Module) -> Module:
+        async with module._activation_lock:
+            if module.__activated__ is None:
+                module_name, path = module.__lazy__
+                if module in self.modules:
+                    await self._remove_module(module)
+
+                logging.info(f"Activating {module.__class__.__name__} on first use")
+                try:
+                    activated = await self.load_module(
+                        module_name, str(path), origin="<custom>"
+                    )
+                    if activated is None:
+                        raise ModuleException(self.get("module_class_not_found"))
+                except BaseException:
+                    self._restore_lazy_module(module)
+                    raise
+
+                module.__activated__ = activated
+
+        return module.__activated__
+
+    def _restore_lazy_module(self, module: Module) -> None:
+        """
+        Puts the placeholder back after a failed activation, so its commands
+        keep answering and the next use retries the import
+        """
+        loaded = self.lookup(module.__class__.__name__)
+        if loaded is not None and loaded is not module:
+            # `on_load` failed after the real module was registered
+            self.registry.remove(loaded)
+            self.dispatcher.unindex_watchers(loaded.watchers)
+
+        if module not in self.modules:
+            self.registry.add(module)
+
+    def _import_module(
         self,
         module_name: str,
         file_path: str = "",
         spec: ModuleSpec = None,
         origin: str = "<string>",
         module_source: str = "",
-        save_file: bool = False,
-        watchdog: bool = False,
-    ) -> Any:
+    ) -> Module | None:
+        module = self._exec_module(module_name, file_path, spec, origin, module_source)
+        if module is None:
+            return None
+
+        return self._instantiate_module(module_name, module, origin)
+
+    def _exec_module(
+        self,
+        module_name: str,
+        file_path: str = "",
+        spec: ModuleSpec = None,
+        origin: str = "<string>",
+        module_source: str = "",
+    ) -> ModuleType | None:
+        """Executes the module source, safe to run outside the loop thread"""
         if spec is None:
             if origin != "<core>":
                 logging.debug("Module spec not found, trying to get manually..")
@@ -218,15 +635,20 @@ class Loader(ABCLoader):
                     module_name, StringLoader(module_source, origin), origin=origin
                 )
             else:
-                return
+                return None
         else:
             if not isinstance(spec, (ModuleSpec, StringLoader)):
-                return
+                return None
 
         module = module_from_spec(spec)
         sys.modules[module_name] = module
         spec.loader.exec_module(module)
 
+        return module
+
+    def _instantiate_module(
+        self, module_name: str, module: ModuleType, origin: str
+    ) -> Module:
         module_class = next(
             (
                 value()
@@ -242,7 +664,6 @@ class Loader(ABCLoader):
             raise ModuleException(self.get("module_class_not_found"))
 
         module_class.__origin__ = origin
-        name = getattr(module_class, "name", module_class.__class__.__name__)
 
         min_version = module_class.MIN_VERSION
         if min_version != "BETA":
@@ -265,6 +686,46 @@ class Loader(ABCLoader):
                     sys.modules.pop(module_name, None)
                     raise ModuleVersionException(exception)
 
+        return module_class
+
+    async def load_module(
+        self,
+        module_name: str,
+        file_path: str = "",
+        spec: ModuleSpec = None,
+        origin: str = "<string>",
+        module_source: str = "",
+        save_file: bool = False,
+        watchdog: bool = False,
+    ) -> Any:
+        manifest = None
+        if file_path:
+            manifest = self.manifests.get(Path(file_path))
+        elif module_source:
+            manifest = extract_manifest(module_source)
+
+        await self.install_module_packages(manifest)
+
+        if self.is_isolated(manifest, Path(file_path) if file_path else None):
+            return await self.load_isolated_module(
+                module_name, file_path, manifest, module_source, save_file, watchdog
+            )
+
+        module_class = self._import_module(
+            module_name, file_path, spec, origin, module_source
+        )
+        if module_class is None:
+            return
+
+        name = getattr(module_class, "name", module_class.__class__.__name__)
+
+        missing = [r for r in module_class.requires if not self.lookup(r)]
+        if missing:
+            sys.modules.pop(module_name, None)
+            raise ModuleException(
+                self.get("missing_requirements").format(", ".join(missing))
+            )
+
         if self.lookup(name):
             if not watchdog:
                 raise ModuleException(self.get("module_already_loaded").format(name))
@@ -276,52 +737,78 @@ class Loader(ABCLoader):
             path = MODULES_PATH / f"{name}.py"
             path.write_text(module_source, encoding="UTF-8")
 
-        await module_class.on_load()
+        try:
+            await self._run_on_load(module_class)
+        except Exception as error:
+            logging.exception(f"Failed to load {name}")
+            self.registry.remove(module_class)
+            self.dispatcher.unindex_watchers(module_class.watchers)
+            sys.modules.pop(module_name, None)
+
+            raise ModuleException(
+                self.get("on_load_fail").format(
+                    html.escape(f"{type(error).__name__}: {error}")
+                )
+            ) from error
 
         gc.collect()
         return module_class
 
-    async def unload_module(self, module_name: str, *, _watchdog: bool) -> str:
-        module = None
-        for mod in self.modules:
-            if module_name.lower() in mod.__class__.__name__.lower():
-                module = mod
-                break
+    async def load_isolated_module(
+        self,
+        module_name: str,
+        file_path: str,
+        manifest: dict,
+        module_source: str = "",
+        save_file: bool = False,
+        watchdog: bool = False,
+    ) -> Module:
+        """
+        Isolated modules are never imported in this process, (re)loading
+        one stops its worker and starts a new one from the current source
+        """
+        name = manifest["class_name"]
+        if self.lookup(name):
+            if not watchdog:
+                raise ModuleException(self.get("module_already_loaded").format(name))
 
-        if module:
-            if module.__origin__ == "<core>" and not _watchdog:
-                raise ModuleException(self.get("unload_core_module_fault"))
+            await self.unload_module(name, _watchdog=watchdog)
+
+        if file_path:
+            path = Path(file_path)
+        else:
+            WORKER_SOURCES_PATH.mkdir(parents=True, exist_ok=True)
+            path = WORKER_SOURCES_PATH / f"{module_name.rsplit('.', 1)[-1]}.py"
+            path.write_text(module_source, encoding="UTF-8")
 
-            self.modules.remove(module)
-            await module.on_unload()
+        module = await self.start_worker(
+            module_name, path, manifest.get("memory_limit")
+        )
+        if module is None:
+            raise ModuleException(self.get("worker_start_fail"))
 
-            self.commands = {
-                k: v for k, v in self.commands.items() if k not in module.commands
-            }
+        if save_file and module_source:
+            (MODULES_PATH / f"{name}.py").write_text(module_source, encoding="UTF-8")
 
-            self.watchers = [w for w in self.watchers if w not in module.watchers]
-            self.raw_handlers = [
-                h for h in self.raw_handlers if h not in module.raw_handlers
-            ]
+        return module
 
-            self.inline_handlers = {
-                k: v
-                for k, v in self.inline_handlers.items()
-                if k not in module.inline_handlers
-            }
+    async def unload_module(self, module_name: str, *, _watchdog: bool) -> str:
+        module = self.lookup(module_name)
 
-            self.callback_handlers = {
-                k: v
-                for k, v in self.callback_handlers.items()
-                if k not in module.callback_handlers
-            }
+        if module:
+            if module.__origin__ == "<core>" and not _watchdog:
+                raise ModuleException(self.get("unload_core_module_fault"))
 
-            self.aliases = {
-                k: v for k, v in self.aliases.items() if k not in module.commands.keys()
-            }
+            await self._remove_module(module)
 
         return module.__class__.__name__ if module else ""
 
+    async def _remove_module(self, module: Module) -> None:
+        self.registry.remove(module)
+        self.dispatcher.unindex_watchers(module.watchers)
+
+        await module.on_unload()
+
     def prepare_module(self, module_class: Module) -> None:
         if module_class.__origin__ == "<core>":
             module_class.loader = self
@@ -329,47 +816,23 @@ class Loader(ABCLoader):
         module_class.client = self.client
         module_class.database = self.database
         module_class.inline = self.inline
+        module_class.http = self.http
 
         # Auto-load config if dataclass Config exists
         config_cls = getattr(module_class, "Config", None)
         if config_cls and hasattr(config_cls, "load"):
             module_class.config = config_cls.load(module_class)
 
-        module_class.load_init()
+        with profiler.phase(f"{module_class.__class__.__name__}: load_init"):
+            module_class.load_init()
         module_class.translator = ModuleTranslator(
             module_class,
             self.translator,
             getattr(module_class, "strings", None),
         )
 
-        self.commands.update(module_class.commands)
-        self.watchers.extend(module_class.watchers)
-
-        self.raw_handlers.extend(module_class.raw_handlers)
-        self.inline_handlers.update(module_class.inline_handlers)
-        self.callback_handlers.update(module_class.callback_handlers)
-
-        self.message_handlers.extend(module_class.message_handlers)
-
-        for name, command in module_class.commands.items():
-            aliases = getattr(command, "alias", None)
-            if isinstance(aliases, str):
-                aliases = [aliases]
-
-            if aliases:
-                for alias in aliases:
-                    self.aliases[alias] = name
-
-        self.modules.append(module_class)
+        self.registry.add(module_class)
+        self.dispatcher.index_watchers(module_class.watchers)
 
     def lookup(self, name: str) -> Any:
-        name = name.lower()
-        return next(
-            (
-                module
-                for module in self.modules
-                if module.__class__.__name__.lower() == name
-                or getattr(module, "name", "").lower() == name
-            ),
-            None,
-        )
+        return self.registry.lookup(name)
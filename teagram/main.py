@@ -2,6 +2,8 @@ from .auth import Authorization
 from .loader import Loader
 
 from .database import Database
+from .profiler import profiler
+from .utils import BASE_PATH
 
 from pyrogram.methods.utilities.idle import idle
 
@@ -77,25 +79,33 @@ class Main:
 
         database = Database()
 
-        client = await Authorization(
-            getattr(self.arguments, "test_mode", False),
-            getattr(self.arguments, "no_qr", False),
-            getattr(self.arguments, "no_web", False),
-            getattr(self.arguments, "port", 0),
-        ).authorize()
+        with profiler.phase("Authorization.authorize"):
+            client = await Authorization(
+                getattr(self.arguments, "test_mode", False),
+                getattr(self.arguments, "no_qr", False),
+                getattr(self.arguments, "no_web", False),
+                getattr(self.arguments, "port", 0),
+            ).authorize()
 
-        await client.connect()
-        await client.initialize()
+        with profiler.phase("client.connect"):
+            await client.connect()
+
+        with profiler.phase("client.initialize"):
+            await client.initialize()
 
         if not client.me:
-            me = await client.get_me()
-            client.me = me
+            with profiler.phase("get_me"):
+                me = await client.get_me()
+                client.me = me
 
         loader = Loader(client, database, self.arguments)
         await loader.load()
 
+        profiler.finish(os.path.join(BASE_PATH, "startup_profile.json"))
+
         await idle()
         logging.info("Shutdown...")
+        await loader.http.close()
         file_handler.flush()
         with open(log_file_path, 'w', encoding='utf-8'):
             pass
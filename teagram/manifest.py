@@ -0,0 +1,196 @@
+import ast
+import hashlib
+import logging
+import os
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import ujson
+
+from .utils import BASE_PATH
+
+MANIFEST_CACHE_PATH = Path(BASE_PATH) / ".cache" / "manifests.json"
+
+HANDLER_DECORATORS = {
+    "watcher",
+    "raw_handler",
+    "inline_handler",
+    "callback_handler",
+    "message_handler",
+}
+HANDLER_SUFFIXES = (
+    "watcher",
+    "raw_handler",
+    "_inline_handler",
+    "_callback_handler",
+    "_message_handler",
+)
+
+
+def _decorator_name(decorator: ast.expr) -> str:
+    if isinstance(decorator, ast.Call):
+        decorator = decorator.func
+
+    if isinstance(decorator, ast.Attribute):
+        return decorator.attr
+    if isinstance(decorator, ast.Name):
+        return decorator.id
+
+    return ""
+
+
+def _is_module_class(node: ast.ClassDef) -> bool:
+    return any(ast.unparse(base).endswith("Module") for base in node.bases)
+
+
+def extract_manifest(source: str) -> Optional[Dict[str, Any]]:
+    """
+    Collects class name, commands and aliases of a module without executing it.
+    `eager` is set when the module has anything a stub can't stand in for
+    (watchers, raw/inline handlers, custom filters, `on_load`, config, ...)
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+
+    node = next(
+        (
+            node
+            for node in tree.body
+            if isinstance(node, ast.ClassDef) and _is_module_class(node)
+        ),
+        None,
+    )
+    if node is None:
+        return None
+
+    manifest = {
+        "class_name": node.name,
+        "commands": {},
+        "eager": False,
+        "isolated": False,
+        "memory_limit": None,
+        "packages": [],
+    }
+
+    for item in node.body:
+        if isinstance(item, (ast.Assign, ast.AnnAssign)):
+            targets = item.targets if isinstance(item, ast.Assign) else [item.target]
+            names = {getattr(t, "id", None) for t in targets}
+
+            # Config is set up on load, config commands need it right away
+            if names & {"requires", "config"}:
+                manifest["eager"] = True
+
+            for name, key in (("ISOLATED", "isolated"), ("MEMORY_LIMIT", "memory_limit")):
+                if name in names and isinstance(item.value, ast.Constant):
+                    manifest[key] = item.value.value
+
+            if "requires_packages" in names and item.value is not None:
+                try:
+                    manifest["packages"] = list(ast.literal_eval(item.value))
+                except (ValueError, TypeError):
+                    pass
+            continue
+
+        if isinstance(item, ast.ClassDef) and item.name == "Config":
+            manifest["eager"] = True
+            continue
+
+        if not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+
+        if item.name in ("__init__", "on_load") or item.name.endswith(HANDLER_SUFFIXES):
+            manifest["eager"] = True
+            continue
+
+        command_decorator = None
+        for decorator in item.decorator_list:
+            name = _decorator_name(decorator)
+            if name in HANDLER_DECORATORS:
+                manifest["eager"] = True
+            elif name == "command":
+                command_decorator = decorator
+
+        if command_decorator is None and not item.name.endswith("cmd"):
+            continue
+
+        aliases = []
+        if isinstance(command_decorator, ast.Call):
+            if command_decorator.args or any(
+                k.arg == "custom_filters" for k in command_decorator.keywords
+            ):
+                manifest["eager"] = True
+
+            for keyword in command_decorator.keywords:
+                if keyword.arg != "alias":
+                    continue
+
+                try:
+                    aliases = ast.literal_eval(keyword.value)
+                except ValueError:
+                    manifest["eager"] = True
+                    continue
+
+                if isinstance(aliases, str):
+                    aliases = [aliases]
+
+        manifest["commands"][item.name.replace("cmd", "")] = {
+            "aliases": list(aliases),
+            "doc": ast.get_docstring(item, clean=False),
+        }
+
+    return manifest
+
+
+class ManifestCache:
+    """
+    Keeps module manifests on disk, keyed by path and validated by
+    mtime/size first and content hash second
+    """
+
+    def __init__(self, path: Path = MANIFEST_CACHE_PATH):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.entries = ujson.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as file:
+                ujson.dump(self.entries, file)
+        except OSError:
+            logging.debug("Failed to save manifest cache", exc_info=True)
+
+    def get(self, path: Path) -> Optional[Dict[str, Any]]:
+        key = str(path)
+        stat = os.stat(path)
+        entry = self.entries.get(key)
+
+        if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["manifest"]
+
+        source = path.read_bytes()
+        digest = hashlib.sha256(source).hexdigest()
+
+        if not entry or entry["hash"] != digest:
+            manifest = extract_manifest(source.decode("utf-8", errors="replace"))
+        else:
+            manifest = entry["manifest"]
+
+        self.entries[key] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": digest,
+            "manifest": manifest,
+        }
+        self._save()
+
+        return manifest
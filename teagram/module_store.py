@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import aiohttp
+import ujson
+
+from .utils import BASE_PATH
+
+MODULE_STORE_PATH = Path(BASE_PATH) / ".cache" / "modules"
+
+# sha256 hex digests, prefixes shorter than this are too likely to collide
+MIN_PREFIX_LENGTH = 8
+DIGEST_PATTERN = re.compile(r"[0-9a-f]{%d,64}" % MIN_PREFIX_LENGTH)
+
+logger = logging.getLogger(__name__)
+
+
+class ModuleStore:
+    """
+    Content-addressed store of downloaded module sources. Re-downloads are
+    conditional (ETag / Last-Modified) and stored versions can be loaded
+    offline by their hash
+    """
+
+    def __init__(self, http: Any, path: Path = MODULE_STORE_PATH):
+        self.http = http
+        self.path = path
+        self.objects = path / "objects"
+        self.index_path = path / "index.json"
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                self.index: Dict[str, Dict[str, Any]] = ujson.load(file)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _save_index(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, "w", encoding="utf-8") as file:
+            ujson.dump(self.index, file, indent=4)
+
+    def put(self, source: str) -> str:
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        path = self.objects / f"{digest}.py"
+        if not path.exists():
+            self.objects.mkdir(parents=True, exist_ok=True)
+            path.write_text(source, encoding="utf-8")
+
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """Returns a stored source by its hash or an unambiguous hash prefix."""
+        digest = (digest or "").lower()
+        if not DIGEST_PATTERN.fullmatch(digest):
+            return None
+
+        matches = list(self.objects.glob(f"{digest}*.py"))
+        if len(matches) != 1:
+            return None
+
+        return matches[0].read_text(encoding="utf-8")
+
+    async def fetch(self, url: str, pin: Optional[str] = None) -> str:
+        """
+        Returns module source for `url`. A pinned hash is served from the
+        store without network; otherwise a conditional request is made and
+        the stored copy is used on 304 or when the host is unreachable
+        """
+        if pin:
+            source = self.get(pin)
+            if source is None:
+                raise KeyError(pin)
+
+            return source
+
+        entry = self.index.get(url, {})
+        cached = self.get(entry["hash"]) if entry.get("hash") else None
+
+        headers = {}
+        if cached is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = await self.http.get(url, headers=headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if cached is None:
+                raise
+
+            logger.warning(f"{url} is unreachable, using stored copy")
+            return cached
+
+        if response.status == 304 and cached is not None:
+            logger.debug(f"{url} not modified, using stored copy")
+            return cached
+
+        response.raise_for_status()
+        source = await response.text()
+
+        digest = self.put(source)
+        versions = entry.get("versions", [])
+        if digest not in versions:
+            versions.append(digest)
+
+        self.index[url] = {
+            "hash": digest,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched": time.time(),
+            "versions": versions,
+        }
+        self._save_index()
+
+        return source
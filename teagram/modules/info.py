@@ -1,12 +1,13 @@
 from .. import loader, utils, __version__
 from aiogram.types.input_file import FSInputFile
 
-import psutil
 import time
 import os
 
 import asyncio
 
+psutil = utils.lazy_import("psutil")
+
 
 async def get_ram() -> float:
     try:
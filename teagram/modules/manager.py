@@ -1,24 +1,24 @@
 from pyrogram.types import Message
 
-from .. import loader, utils
+from .. import loader, utils, zygote
 
-from ..translator import SUPPORTED_LANGUAGES
+from ..translator import get_supported_languages
 from ..types import ModuleException, ModuleVersionException
 
 from time import time
 
-import subprocess
+import html
 import logging
 
 import atexit
-import psutil
-
-import aiohttp
 
 import sys
 import os
 
-import git
+psutil = utils.lazy_import("psutil")
+git = utils.lazy_import("git")
+
+PROGRESS_INTERVAL = 2
 
 
 def kill(force: bool = False):
@@ -39,9 +39,15 @@ def kill(force: bool = False):
         pass
 
 
-def restart(*_):
+def restart(cold: bool = False):
     logging.info("Restarting...")
 
+    if zygote.is_zygote_child():
+        logging.shutdown()
+        os._exit(
+            zygote.COLD_RESTART_EXIT_CODE if cold else zygote.RESTART_EXIT_CODE
+        )
+
     os.execl(
         sys.executable,
         sys.executable,
@@ -55,22 +61,30 @@ class Manager(loader.Module):
     strings = {
         "name": "Manager",
         "setconfig_usage": "Usage: .setconfig <module> <key> <value>",
-        "setconfig_success": "Value '{key}' for module '{module}' set to: {value}",
-        "setconfig_key_not_found": "Key '{key}' not found in config of module '{module}.",
-        "setconfig_module_not_found": "Module '{module}' not found or does not support config.",
+        "setconfig_success": "Value '{key}' for module '{module_name}' set to: {value}",
+        "setconfig_key_not_found": "Key '{key}' not found in config of module '{module_name}'.",
+        "setconfig_module_not_found": "Module '{module_name}' not found or does not support config.",
         "setconfig_type_error": "Failed to convert value '{value}' to type {type}.",
         "getconfig_usage": "Usage: .getconfig <module> <key>",
-        "getconfig_key_not_found": "Key '{key}' not found in config of module '{module}.",
-        "getconfig_module_not_found": "Module '{module}' not found or does not support config.",
+        "getconfig_key_not_found": "Key '{key}' not found in config of module '{module_name}'.",
+        "getconfig_module_not_found": "Module '{module_name}' not found or does not support config.",
+        "getconfig_value": "<b>{module_name}.{key}</b> = <code>{value}</code>",
         "showconfig_usage": "Usage: .showconfig <module>",
-        "showconfig_module_not_found": "Module '{module}' not found or does not support config.",
+        "showconfig_module_not_found": "Module '{module_name}' not found or does not support config.",
+        "showconfig_line": "<b>{key}</b>: <code>{value}</code>",
+        "showconfig_title": "<b>Config for module {module_name}:</b>\n",
     }
 
     async def on_load(self):
+        data = self.database.get("teagram", "restart_info", None)
+        if data:
+            # Measured now, the message itself is edited once startup settles
+            restart_time = round(time() - data["time"])
+            self.loader.defer(lambda: self.report_restart(data, restart_time))
+
+    async def report_restart(self, data: dict, restart_time: int):
         try:
-            data = self.database.get("teagram", "restart_info", None)
             if data:
-                restart_time = round(time() - data["time"])
                 message = await self.client.get_messages(data["chat"], data["id"])
 
                 await utils.answer(
@@ -81,30 +95,41 @@ class Manager(loader.Module):
         finally:
             self.database.pop("teagram", "restart_info")
 
-    def check_requirements(self, repo, sha):
+    async def check_requirements(self, repo, sha, message=None):
         commit = repo.commit(sha)
         diffs = commit.diff(commit.parents[0])
         for diff in diffs:
             if diff.a_path == "requirements.txt" or diff.b_path == "requirements.txt":
-                return self.download_requirements()
+                await self.download_requirements(message)
+                return True
+
+        return False
+
+    async def download_requirements(self, message=None):
+        lines = []
+        last_update = 0
+
+        async def progress(line: str):
+            nonlocal message, last_update
+
+            lines.append(line)
+            if message and time() - last_update >= PROGRESS_INTERVAL:
+                last_update = time()
+                message = await utils.answer(
+                    message,
+                    self.get("installing_requirements").format(
+                        html.escape("\n".join(lines[-10:]))
+                    ),
+                )
 
-    def download_requirements(self):
-        try:
-            subprocess.run(
-                [
-                    sys.executable,
-                    "-m",
-                    "pip",
-                    "install",
-                    "-r",
-                    "requirements.txt",
-                    "--user",
-                ],
-                check=True,
-            )
-        except subprocess.CalledProcessError:
+        if not await utils.install_packages(
+            requirements_file="requirements.txt", progress=progress
+        ):
             logging.error("Error during installing requirements.txt")
 
+    async def fetch_code(self, url: str, pin: str = None) -> str:
+        return await self.loader.module_store.fetch(url, pin)
+
     async def load_module(
         self, code: str, save_file: bool = False, origin: str = "<string>"
     ):
@@ -128,12 +153,22 @@ class Manager(loader.Module):
         kill(True)
 
     @loader.command()
-    async def restart(self, message):
+    async def restart(self, message, args=""):
         """
-        — restart the userbot process
+        [--hard] — reload all modules, --hard restarts the whole process
         """
+        if args and any(arg in args.split() for arg in ("--hard", "-f")):
+            return await self.hard_restart(message)
+
+        message = await utils.answer(message, self.get("restarting"))
+        elapsed = await self.loader.reload_modules()
+
+        await utils.answer(
+            message, self.get("soft_restart_success").format(round(elapsed * 1000))
+        )
+
+    async def hard_restart(self, message, cold: bool = False):
         message = await utils.answer(message, self.get("restarting"))
-        atexit.register(restart)
 
         self.database.set(
             "teagram",
@@ -141,6 +176,11 @@ class Manager(loader.Module):
             {"chat": message.chat.id, "id": message.id, "time": time()},
         )
 
+        if zygote.is_zygote_child():
+            # Zygote children leave through os._exit, atexit hooks never run
+            return restart(cold)
+
+        atexit.register(restart, cold)
         kill()
 
     @loader.command()
@@ -165,9 +205,9 @@ class Manager(loader.Module):
                 return await utils.answer(message, self.get("uptodate"))
 
             repo.git.pull()
-            self.check_requirements(repo, remote_commit)
+            cold = await self.check_requirements(repo, remote_commit, message)
 
-            await self.restart(message)
+            await self.hard_restart(message, cold)
         except git.exc.GitCommandError as e:
             return await utils.answer(message, self.get("update_fail").format(e))
         except Exception as e:
@@ -203,9 +243,11 @@ class Manager(loader.Module):
             repo.git.checkout(branch_name)
             repo.git.pull()
 
-            self.check_requirements(repo, repo.head.commit.hexsha)
+            cold = await self.check_requirements(
+                repo, repo.head.commit.hexsha, message
+            )
 
-            await self.restart(message)
+            await self.hard_restart(message, cold)
         except git.exc.GitCommandError as e:
             return await utils.answer(
                 message, self.get("changing_fail").format(branch_name, e)
@@ -271,21 +313,33 @@ class Manager(loader.Module):
 
     @loader.command(alias="dlm")
     async def downloadmod(self, message, args):
-        url = args.strip()
-        if not url:
+        """
+        <url> [version] — load a module from url, version pins a stored copy
+        """
+        parts = args.split()[:2] if args else []
+        if not parts:
             return await utils.answer(message, self.get("module_not_found"))
 
+        url, *pin = parts
+
+        store = self.loader.module_store
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    module_code = await response.text()
-                    if not module_code:
-                        raise Exception()
+            if utils.is_url(url):
+                module_code = await self.fetch_code(url, *pin)
+            else:
+                module_code = store.get(url)
+
+            if not module_code:
+                raise Exception()
         except Exception:
             return await utils.answer(message, self.get("unexpected_error"))
 
         module_name = await self.load_module(module_code)
-        await utils.answer(message, self.get("load_success").format(module_name))
+        await utils.answer(
+            message,
+            self.get("load_success").format(module_name)
+            + self.get("module_version").format(store.put(module_code)[:12]),
+        )
 
     @loader.command()
     async def setlang(self, message, args: str):
@@ -293,17 +347,42 @@ class Manager(loader.Module):
         <lang> — set the interface language
         """
         language = args.strip().lower()
-        if language not in SUPPORTED_LANGUAGES:
+        languages = get_supported_languages()
+        if language not in languages:
             return await utils.answer(
                 message,
-                self.get("language_not_supported").format(
-                    ", ".join(SUPPORTED_LANGUAGES)
-                ),
+                self.get("language_not_supported").format(", ".join(languages)),
             )
 
         self.loader.translator.language = language
         await utils.answer(message, self.get("set_lang_success").format(language))
 
+    @loader.command()
+    async def chatlang(self, message, args: str):
+        """
+        <lang | reset> — set the interface language for this chat
+        """
+        language = args.strip().lower()
+        translator = self.loader.translator
+
+        if language == "reset":
+            translator.set_chat_language(message.chat.id, None)
+            with translator.use(message.chat.id):
+                return await utils.answer(message, self.get("chat_lang_reset"))
+
+        languages = get_supported_languages()
+        if language not in languages:
+            return await utils.answer(
+                message,
+                self.get("language_not_supported").format(", ".join(languages)),
+            )
+
+        translator.set_chat_language(message.chat.id, language)
+        with translator.use(message.chat.id):
+            await utils.answer(
+                message, self.get("chat_lang_success").format(language)
+            )
+
     @loader.command()
     async def addprefix(self, message, args: str):
         """
@@ -359,14 +438,14 @@ class Manager(loader.Module):
 
         parts = args.strip().split(maxsplit=2)
         if len(parts) != 3:
-            return await utils.answer(message, self.get("setconfig_usage", default="Usage: .setconfig <module> <key> <value>"))
+            return await utils.answer(message, self.get("setconfig_usage"))
         module_name, key, value = parts
         module = self.loader.lookup(module_name)
         if not module or not hasattr(module, "config"):
-            return await utils.answer(message, self.get("setconfig_module_not_found", default=f"Module '{module_name}' not found or does not support config.").format(module_name=module_name))
+            return await utils.answer(message, self.get("setconfig_module_not_found").format(module_name=module_name))
         config = module.config
         if not hasattr(config, key):
-            return await utils.answer(message, self.get("setconfig_key_not_found", default=f"Key '{key}' not found in config of module '{module_name}'.").format(key=key, module_name=module_name))
+            return await utils.answer(message, self.get("setconfig_key_not_found").format(key=key, module_name=module_name))
         # Get type from dataclass field
         field_type = None
         if hasattr(config, "__dataclass_fields__") and key in config.__dataclass_fields__:
@@ -383,11 +462,11 @@ class Manager(loader.Module):
                 else:
                     value = field_type(value)
             except Exception:
-                return await utils.answer(message, self.get("setconfig_type_error", default="Failed to convert value '{value}' to type {type}.").format(value=value, type=field_type))
+                return await utils.answer(message, self.get("setconfig_type_error").format(value=value, type=field_type))
         setattr(config, key, value)
         if hasattr(module, "save_config"):
             module.save_config()
-        await utils.answer(message, self.get("setconfig_success", default="Value '{key}' for module '{module_name}' set to: {value}").format(key=key, module_name=module_name, value=value))
+        await utils.answer(message, self.get("setconfig_success").format(key=key, module_name=module_name, value=value))
 
     @loader.command()
     async def getconfig(self, message: Message, args: str):
@@ -396,19 +475,19 @@ class Manager(loader.Module):
         """
         parts = args.strip().split(maxsplit=1)
         if len(parts) != 2:
-            return await utils.answer(message, self.get("getconfig_usage", default="Usage: .getconfig <module> <key>"))
+            return await utils.answer(message, self.get("getconfig_usage"))
         module_name, key = parts
         module = self.loader.lookup(module_name)
         if not module or not hasattr(module, "config"):
-            return await utils.answer(message, self.get("getconfig_module_not_found", default=f"Module '{module_name}' not found or does not support config.").format(module_name=module_name))
+            return await utils.answer(message, self.get("getconfig_module_not_found").format(module_name=module_name))
         config = module.config
         if not hasattr(config, key):
-            return await utils.answer(message, self.get("getconfig_key_not_found", default=f"Key '{key}' not found in config of module '{module_name}'.").format(key=key, module_name=module_name))
+            return await utils.answer(message, self.get("getconfig_key_not_found").format(key=key, module_name=module_name))
         value = getattr(config, key)
         desc = None
         if hasattr(config, "__dataclass_fields__"):
             desc = config.__dataclass_fields__[key].metadata.get("description")
-        text = self.get("getconfig_value", default="<b>{module_name}.{key}</b> = <code>{value}</code>").format(module_name=module_name, key=key, value=value)
+        text = self.get("getconfig_value").format(module_name=module_name, key=key, value=value)
         if desc:
             text += f"\n<i>{desc}</i>"
         await utils.answer(message, text)
@@ -421,18 +500,18 @@ class Manager(loader.Module):
         module_name = args.strip()
         module = self.loader.lookup(module_name)
         if not module or not hasattr(module, "config"):
-            return await utils.answer(message, self.get("showconfig_module_not_found", default=f"Module '{module_name}' not found or does not support config.").format(module_name=module_name))
+            return await utils.answer(message, self.get("showconfig_module_not_found").format(module_name=module_name))
         config = module.config
         if hasattr(config, "__dataclass_fields__"):
             lines = []
             for key, field in config.__dataclass_fields__.items():
                 value = getattr(config, key)
                 desc = field.metadata.get("description")
-                line = self.get("showconfig_line", default="<b>{key}</b>: <code>{value}</code>").format(key=key, value=value)
+                line = self.get("showconfig_line").format(key=key, value=value)
                 if desc:
                     line += f" — <i>{desc}</i>"
                 lines.append(line)
-            text = self.get("showconfig_title", default="<b>Config for module {module_name}:</b>\n").format(module_name=module_name) + "\n".join(lines)
+            text = self.get("showconfig_title").format(module_name=module_name) + "\n".join(lines)
         else:
             text = str(config)
         await utils.answer(message, text)
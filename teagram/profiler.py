@@ -0,0 +1,72 @@
+import logging
+import time
+
+from contextlib import contextmanager
+from typing import List, Tuple
+
+import ujson
+
+
+class StartupProfiler:
+    """
+    Records a timeline of startup phases when `--profile-startup` is passed,
+    phases may overlap since modules are loaded concurrently
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.events: List[Tuple[str, float, float]] = []
+
+    def enable(self, started_at: float) -> None:
+        """`started_at` is a `time.time()` timestamp of the process start."""
+        self.enabled = True
+        self.origin = time.perf_counter() - (time.time() - started_at)
+
+    def record(self, name: str, start: float, end: float) -> None:
+        if self.enabled:
+            self.events.append((name, start - self.origin, end - start))
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def report(self) -> str:
+        lines = ["Startup profile (slowest first):"]
+        for name, offset, duration in sorted(
+            self.events, key=lambda event: event[2], reverse=True
+        ):
+            lines.append(f"{duration * 1000:10.1f}ms  @{offset * 1000:10.1f}ms  {name}")
+
+        lines.append(f"Total: {(time.perf_counter() - self.origin) * 1000:.1f}ms")
+        return "\n".join(lines)
+
+    def finish(self, path: str) -> None:
+        if not self.enabled:
+            return
+
+        logging.info(self.report())
+
+        with open(path, "w", encoding="utf-8") as file:
+            ujson.dump(
+                [
+                    {"phase": name, "start": offset, "duration": duration}
+                    for name, offset, duration in sorted(self.events, key=lambda e: e[1])
+                ],
+                file,
+                indent=4,
+            )
+
+        logging.info(f"Startup profile saved to {path}")
+        self.enabled = False
+
+
+profiler = StartupProfiler()
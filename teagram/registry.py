@@ -0,0 +1,120 @@
+from types import FunctionType
+from typing import Any, Dict, List, Optional
+
+from .routing import SEPARATOR, CallbackRouter
+from .types import Module
+
+
+class ModuleRegistry:
+    """
+    Keeps loaded modules and their handlers, every handler is indexed by its
+    owning module so adding and removing a module only touches its own entries
+    """
+
+    def __init__(self):
+        self.modules: Dict[Module, Dict[str, List[Any]]] = {}
+        self.names: Dict[str, Module] = {}
+
+        self.commands: Dict[str, FunctionType] = {}
+        self.aliases: Dict[str, str] = {}
+
+        # Dicts are used as ordered sets here: handler -> owning module
+        self.watchers: Dict[FunctionType, Module] = {}
+        self.raw_handlers: Dict[FunctionType, Module] = {}
+        self.message_handlers: Dict[FunctionType, Module] = {}
+
+        self.inline_handlers: Dict[str, FunctionType] = {}
+        self.callback_handlers: Dict[str, FunctionType] = {}
+        self.callback_routes = CallbackRouter()
+
+    def __iter__(self):
+        return iter(self.modules)
+
+    def __len__(self) -> int:
+        return len(self.modules)
+
+    def __contains__(self, module: Module) -> bool:
+        return module in self.modules
+
+    @staticmethod
+    def get_names(module: Module) -> set:
+        return {
+            module.__class__.__name__.lower(),
+            getattr(module, "name", module.__class__.__name__).lower(),
+        }
+
+    @staticmethod
+    def get_route(module: Module, key: str, handler: FunctionType) -> str:
+        """`route` set in `callback_handler` or `<module>:<handler>`"""
+        return getattr(handler, "route", None) or SEPARATOR.join(
+            (module.__class__.__name__.lower(), key)
+        )
+
+    def add(self, module: Module) -> None:
+        owned = {
+            "names": list(self.get_names(module)),
+            "commands": list(module.commands.items()),
+            "aliases": [],
+            "watchers": list(module.watchers),
+            "raw_handlers": list(module.raw_handlers),
+            "message_handlers": list(module.message_handlers),
+            "inline_handlers": list(module.inline_handlers.items()),
+            "callback_handlers": list(module.callback_handlers.items()),
+            "callback_routes": [
+                (self.get_route(module, key, handler), handler)
+                for key, handler in module.callback_handlers.items()
+            ],
+        }
+
+        for name in owned["names"]:
+            self.names[name] = module
+
+        self.commands.update(module.commands)
+        for name, command in module.commands.items():
+            aliases = getattr(command, "alias", None)
+            if isinstance(aliases, str):
+                aliases = [aliases]
+
+            for alias in aliases or []:
+                self.aliases[alias] = name
+                owned["aliases"].append((alias, name))
+
+        for kind in ("watchers", "raw_handlers", "message_handlers"):
+            handlers = getattr(self, kind)
+            for handler in owned[kind]:
+                handlers[handler] = module
+
+        self.inline_handlers.update(module.inline_handlers)
+        self.callback_handlers.update(module.callback_handlers)
+        for route, handler in owned["callback_routes"]:
+            self.callback_routes.add(route, handler)
+
+        self.modules[module] = owned
+
+    def remove(self, module: Module) -> None:
+        owned = self.modules.pop(module, None)
+        if owned is None:
+            return
+
+        for name in owned["names"]:
+            if self.names.get(name) is module:
+                del self.names[name]
+
+        # Only drop entries which weren't overridden by another module
+        for kind in ("commands", "aliases", "inline_handlers", "callback_handlers"):
+            entries = getattr(self, kind)
+            for key, value in owned[kind]:
+                if entries.get(key) == value:
+                    del entries[key]
+
+        for kind in ("watchers", "raw_handlers", "message_handlers"):
+            handlers = getattr(self, kind)
+            for handler in owned[kind]:
+                if handlers.get(handler) is module:
+                    del handlers[handler]
+
+        for route, handler in owned["callback_routes"]:
+            self.callback_routes.remove(route, handler)
+
+    def lookup(self, name: str) -> Optional[Module]:
+        return self.names.get(name.lower())
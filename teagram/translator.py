@@ -1,53 +1,286 @@
+import hashlib
+import logging
+import os
+import re
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
 from os import listdir
-import yaml
-from typing import Dict, Optional, Any
+from string import Formatter
+from typing import Dict, FrozenSet, List, Optional, Any, Set, Tuple
 
-SUPPORTED_LANGUAGES = [
-    lang[:-5] for lang in listdir("teagram/translations") if lang.endswith(".yaml")
-]
+import ujson
+
+TRANSLATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translations")
+CATALOG_CACHE_PATH = os.path.normpath(
+    os.path.join(TRANSLATIONS_PATH, "..", "..", ".cache", "translations")
+)
+
+# Language of the chat/user whose update is being handled, see `Translator.use`
+current_language: ContextVar[Optional[str]] = ContextVar(
+    "current_language", default=None
+)
+
+
+def load_catalog(path: str) -> Dict[str, Any]:
+    """
+    Loads a YAML catalog through a JSON copy keyed by the file hash,
+    so YAML is parsed only after the file changes
+    """
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return {}
+
+    cache_path = os.path.join(
+        CATALOG_CACHE_PATH, f"{hashlib.sha256(data).hexdigest()}.json"
+    )
+    try:
+        with open(cache_path, "r", encoding="utf-8") as file:
+            return ujson.load(file)
+    except (OSError, ValueError):
+        pass
+
+    import yaml
+
+    catalog = yaml.safe_load(data) or {}
+    try:
+        os.makedirs(CATALOG_CACHE_PATH, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as file:
+            ujson.dump(catalog, file)
+    except OSError:
+        logging.debug(f"Failed to cache compiled catalog of {path}")
+
+    return catalog
+
+
+@lru_cache(maxsize=None)
+def get_supported_languages() -> List[str]:
+    """Lists available languages, the directory is read on first call."""
+    return [lang[:-5] for lang in listdir(TRANSLATIONS_PATH) if lang.endswith(".yaml")]
+
+
+def __getattr__(name: str) -> Any:
+    # Kept for modules that import `SUPPORTED_LANGUAGES` directly
+    if name == "SUPPORTED_LANGUAGES":
+        return get_supported_languages()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class Template(str):
+    """
+    Translated string with its format fields parsed once at load, so
+    placeholders that differ between languages are reported up front.
+    Renders with plain `str.format`
+    """
+
+    _formatter = Formatter()
+
+    def __new__(cls, value: str):
+        self = super().__new__(cls, value)
+
+        self.fields: Optional[FrozenSet[str]] = self._parse_fields()
+        return self
+
+    def _parse_fields(self) -> Optional[FrozenSet[str]]:
+        """Names of the fields, `None` if the string can't be formatted"""
+        try:
+            parsed = list(self._formatter.parse(self))
+        except ValueError:
+            return None
+
+        fields, auto_index, manual = [], 0, False
+        for _, field, _, _ in parsed:
+            if field is None:
+                continue
+
+            # Attribute access and indexing use the name before them
+            field = re.split(r"[.\[]", field, maxsplit=1)[0]
+            if field == "":
+                if manual:
+                    return None
+                field, auto_index = str(auto_index), auto_index + 1
+            elif field.isdigit():
+                if auto_index:
+                    return None
+                manual = True
+
+            fields.append(field)
+
+        return frozenset(fields)
 
 
 class Translator:
     """
-    Loads and manages translations for the userbot.
+    Loads and manages translations for the userbot. Every loaded language
+    is kept in one table of interned strings indexed by (section, key)
+    slots, so switching languages doesn't reload anything
     """
 
     def __init__(self, database: Any):
         self.database = database
-        self.translations: Dict[str, Dict[str, str]] = {}
+
+        # section -> directory with `<language>.yaml` catalogs of a module
+        self.catalogs: Dict[str, str] = {}
+
+        self._languages: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self._merged: Dict[str, Set[str]] = {}
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._rows: Dict[str, List[Optional[Template]]] = {}
+        self._templates: Dict[str, Template] = {}
+
+        self._language = self.database.get("teagram", "language")
+        if not self._language:
+            self._language = "en"
+            self.database.set("teagram", "language", self._language)
+
+        # chat or user id -> language
+        self.chat_languages: Dict[str, str] = dict(
+            self.database.get("teagram", "chat_languages") or {}
+        )
 
         self.fetch_translations()
 
     @property
     def language(self) -> str:
-        lang = self.database.get("teagram", "language")
-        if not lang:
-            lang = "en"
-            self.database.set("teagram", "language", lang)
-        return lang
+        """Default language, used where no chat language is set."""
+        return self._language
 
     @language.setter
     def language(self, lang: str) -> None:
-        if lang not in SUPPORTED_LANGUAGES:
+        self._check_language(lang)
+        if self._language != lang:
+            self._language = lang
+            self.database.set("teagram", "language", lang)
+
+    @property
+    def translations(self) -> Dict[str, Dict[str, str]]:
+        return self.load_language(self.language)
+
+    def _check_language(self, lang: str) -> None:
+        languages = get_supported_languages()
+        if lang not in languages:
             raise ValueError(
-                f"Invalid language. Supported languages: {', '.join(SUPPORTED_LANGUAGES)}"
+                f"Invalid language. Supported languages: {', '.join(languages)}"
             )
-        if self.language != lang:
-            self.database.set("teagram", "language", lang)
-            self.fetch_translations()
 
-    def fetch_translations(self) -> None:
+    def set_chat_language(self, chat_id: int, lang: Optional[str]) -> None:
+        """Sets the language of a chat or user, `None` resets it to default."""
+        if lang is None:
+            self.chat_languages.pop(str(chat_id), None)
+        else:
+            self._check_language(lang)
+            self.chat_languages[str(chat_id)] = lang
+
+        self.database.set("teagram", "chat_languages", self.chat_languages)
+
+    def language_for(
+        self, chat_id: Optional[int] = None, user_id: Optional[int] = None
+    ) -> str:
+        for id_ in (chat_id, user_id):
+            if id_ is not None and str(id_) in self.chat_languages:
+                return self.chat_languages[str(id_)]
+
+        return self.language
+
+    @contextmanager
+    def use(self, chat_id: Optional[int] = None, user_id: Optional[int] = None):
+        """Translates in the language of the chat/user within the block."""
+        token = current_language.set(self.language_for(chat_id, user_id))
         try:
-            with open(
-                f"teagram/translations/{self.language}.yaml", encoding="utf-8"
-            ) as stream:
-                self.translations = yaml.safe_load(stream) or {}
-        except FileNotFoundError:
-            self.translations = {}
-
-    def get(self, section: str, key: str) -> Optional[str]:
+            yield
+        finally:
+            current_language.reset(token)
+
+    def current(self) -> str:
+        return current_language.get() or self.language
+
+    def fetch_translations(self) -> None:
+        """
+        Drops loaded languages so changed files are picked up, the active
+        one is loaded right away and others on first use
+        """
+        self._languages = {}
+        self._merged = {}
+        self._rows = {}
+        self._templates = {}
+
+        self.load_language(self.language)
+
+    def load_language(self, lang: str) -> Dict[str, Dict[str, str]]:
+        translations = self._languages.get(lang)
+        if translations is None:
+            translations = self._languages[lang] = load_catalog(
+                os.path.join(TRANSLATIONS_PATH, f"{lang}.yaml")
+            )
+            self._merged[lang] = set()
+
+        return translations
+
+    def register_catalog(self, section: str, directory: str) -> None:
+        self.catalogs[section] = directory
+        for merged in self._merged.values():
+            merged.discard(section)
+
+        self._rows = {}
+
+    def get_section(
+        self, section: str, lang: Optional[str] = None
+    ) -> Optional[Dict[str, str]]:
+        lang = lang or self.current()
+        translations = self.load_language(lang)
+
+        merged = self._merged[lang]
+        if section in self.catalogs and section not in merged:
+            merged.add(section)
+
+            catalog = load_catalog(
+                os.path.join(self.catalogs[section], f"{lang}.yaml")
+            )
+            if catalog:
+                translations[section] = {**translations.get(section, {}), **catalog}
+
+        return translations.get(section)
+
+    def template(self, value: Any) -> Any:
+        """Returns a shared parsed `Template` for a string."""
+        if not isinstance(value, str):
+            return value
+
+        template = self._templates.get(value)
+        if template is None:
+            template = self._templates[sys.intern(value)] = Template(value)
+
+        return template
+
+    def _resolve(self, lang: str, section: str, key: str) -> Optional[Template]:
+        return self.template((self.get_section(section, lang) or {}).get(key))
+
+    def slot(self, section: str, key: str) -> int:
+        """Returns the table index of section/key, allocating it on first use."""
+        slot = self._slots.get((section, key))
+        if slot is None:
+            slot = self._slots[(section, key)] = len(self._slots)
+            for lang, row in self._rows.items():
+                row.append(self._resolve(lang, section, key))
+
+        return slot
+
+    def row(self, lang: str) -> List[Optional[Template]]:
+        row = self._rows.get(lang)
+        if row is None:
+            row = self._rows[lang] = [
+                self._resolve(lang, section, key) for section, key in self._slots
+            ]
+
+        return row
+
+    def get(self, section: str, key: str) -> Optional[Template]:
         """Get translation for section/key."""
-        return self.translations.get(section, {}).get(key)
+        return self.row(self.current())[self.slot(section, key)]
 
 
 class ModuleTranslator:
@@ -68,16 +301,66 @@ class ModuleTranslator:
         )
 
         self.module_translations = module_translations or {}
-        if not translator.translations.get(self.module_name):
+
+        catalogs = getattr(module_class, "catalogs", None)
+        if catalogs:
+            module = sys.modules.get(module_class.__class__.__module__)
+            origin = getattr(module, "__file__", None)
+            if origin and not os.path.isabs(catalogs):
+                catalogs = os.path.join(os.path.dirname(origin), catalogs)
+
+            translator.register_catalog(self.module_name, catalogs)
+
+        if not catalogs and not translator.translations.get(self.module_name):
             self.module_name = self.module_translations.get(
                 "name", self.module_name
             ).lower()
 
         self.translator = translator
+        self._slots: Dict[str, int] = {}
+        self.defaults: Dict[str, Any] = {
+            key: translator.template(value)
+            for key, value in self.module_translations.items()
+        }
+
+        for problem in self.check():
+            logging.warning(f"{self.module_name}: {problem}")
+
+    def check(self, lang: Optional[str] = None) -> List[str]:
+        """
+        Finds keys missing in `lang` (the default language if not set) and
+        strings whose placeholders differ from the module's defaults
+        """
+        lang = lang or self.translator.language
+        section = self.translator.get_section(self.module_name, lang) or {}
+        reference = self.translator.get_section(self.module_name, "en") or {}
+
+        problems = []
+        for key in {**reference, **section, **self.defaults}:
+            value = self.translator.template(section.get(key))
+            default = self.defaults.get(key)
+            if value is None and default is None:
+                problems.append(f"missing `{key}` in {lang}")
+            elif (
+                isinstance(value, Template)
+                and isinstance(default, Template)
+                and value.fields != default.fields
+            ):
+                problems.append(
+                    f"`{key}` in {lang} uses {sorted(value.fields or ())}, "
+                    f"but the default uses {sorted(default.fields or ())}"
+                )
 
-    def get(self, key: str) -> Optional[str]:
+        return problems
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[Template]:
         """Get translation for a key in this module."""
-        translations = self.translator.translations.get(
-            self.module_name, self.module_translations
-        )
-        return translations.get(key) if translations else None
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = self.translator.slot(self.module_name, key)
+
+        value = self.translator.row(self.translator.current())[slot]
+        if value is None:
+            value = self.defaults.get(key)
+
+        return value if value is not None else self.translator.template(default)
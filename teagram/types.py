@@ -1,11 +1,20 @@
 from typing import List, Dict, Final, Any, Optional
 import types
+import os
+import marshal
+import hashlib
+import logging
+from pathlib import Path
 from .client import CustomClient
 from .database import Database
 from .translator import Translator, ModuleTranslator
+from .utils import BASE_PATH
 from importlib.abc import SourceLoader
+from importlib.util import MAGIC_NUMBER
 from abc import ABC, abstractmethod
 
+BYTECODE_CACHE_PATH = Path(BASE_PATH) / ".cache" / "bytecode"
+
 
 class ABCLoader(ABC):
     """
@@ -16,19 +25,21 @@ class ABCLoader(ABC):
         self.client: CustomClient = client
         self.database: Database = database
 
-        self.modules: List[Module] = []
+        self.modules: Dict[Module, Any] = {}
         self.core_modules: Final[List[str]] = []
 
         self.commands: Dict[str, types.FunctionType] = {}
-        self.aliases: Dict[str, types.FunctionType] = {}
+        self.aliases: Dict[str, str] = {}
 
-        self.raw_handlers: List[types.FunctionType] = []
-        self.watchers: List[types.FunctionType] = []
+        # handler -> owning module, iterated as ordered sets
+        self.raw_handlers: Dict[types.FunctionType, Module] = {}
+        self.watchers: Dict[types.FunctionType, Module] = {}
 
         self.inline_handlers: Dict[str, types.FunctionType] = {}
         self.callback_handlers: Dict[str, types.FunctionType] = {}
+        self.callback_routes: Any = None
 
-        self.message_handlers: List[types.FunctionType] = []
+        self.message_handlers: Dict[types.FunctionType, Module] = {}
 
         self.dispatcher: Any = None
         self.inline_dispatcher: Any = None
@@ -60,32 +71,74 @@ class ModuleVersionException(Exception):
     pass
 
 
+# kind -> (method name suffix, decorator marker)
+HANDLER_KINDS: Final[Dict[str, tuple]] = {
+    "commands": ("cmd", "is_command"),
+    "watchers": ("watcher", "is_watcher"),
+    "inline_handlers": ("_inline_handler", "is_inline_handler"),
+    "callback_handlers": ("_callback_handler", "is_callback_handler"),
+    "raw_handlers": ("raw_handler", "is_raw_handler"),
+    "message_handlers": ("_message_handler", "is_message_handler"),
+}
+LIST_HANDLER_KINDS: Final[tuple] = ("watchers", "raw_handlers", "message_handlers")
+
+
 class Module:
     """
     Base class for all modules.
+
+    Module files of custom modules are executed in a worker thread at
+    startup, so module-level code must not touch the event loop
+    (`asyncio.get_event_loop()`, creating tasks, ...). `__init__` and
+    `on_load` run on the loop thread and may.
     """
 
     MIN_VERSION: str = "BETA"
     MODULE_VERSION: str = "Not specified"
 
+    # Names of modules which have to be loaded before this one
+    requires: List[str] = []
+    # pip requirements installed before the module is imported
+    requires_packages: List[str] = []
+
+    # Run the module in a separate worker process, MEMORY_LIMIT is in bytes
+    ISOLATED: bool = False
+    MEMORY_LIMIT: Optional[int] = None
+
+    # kind -> {handler key: attribute name}, filled in on subclass creation
+    __handlers__: Dict[str, Dict[str, str]] = {kind: {} for kind in HANDLER_KINDS}
+
+    # Directory with `<language>.yaml` catalogs shipped with the module,
+    # relative to the module file. Merged on first lookup in that language
+    catalogs: Optional[str] = None
+
     translator: ModuleTranslator
+    http: Any
 
-    def get(self, key: str) -> Optional[str]:
-        return self.translator.get(key)
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
 
-    def load_init(self):
-        self.commands = get_methods(self, "cmd", "is_command")
-        self.watchers = get_methods(self, "watcher", "is_watcher")
+        handlers = {kind: dict(entries) for kind, entries in cls.__handlers__.items()}
+        for name, value in vars(cls).items():
+            if not callable(value):
+                continue
 
-        self.inline_handlers = get_methods(self, "_inline_handler", "is_inline_handler")
-        self.callback_handlers = get_methods(
-            self, "_callback_handler", "is_callback_handler"
-        )
+            for kind, (suffix, marker) in HANDLER_KINDS.items():
+                if name.endswith(suffix) or getattr(value, marker, False):
+                    handlers[kind][name.replace(suffix, "")] = name
 
-        self.raw_handlers = get_methods(self, "raw_handler", "is_raw_handler")
-        self.message_handlers = list(
-            get_methods(self, "_message_handler", "is_message_handler").values()
-        )
+        cls.__handlers__ = handlers
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self.translator.get(key, default)
+
+    def load_init(self):
+        for kind, entries in self.__handlers__.items():
+            handlers = {key: getattr(self, name) for key, name in entries.items()}
+            if kind in LIST_HANDLER_KINDS:
+                handlers = list(handlers.values())
+
+            setattr(self, kind, handlers)
 
     async def on_load(self):
         pass
@@ -103,11 +156,23 @@ class StringLoader(SourceLoader):
         self.data = data.encode("utf-8")
         self.origin = origin
 
+    @property
+    def cache_path(self) -> Path:
+        digest = hashlib.sha256(self.origin.encode("utf-8") + b"\0" + self.data)
+        return BYTECODE_CACHE_PATH / f"{digest.hexdigest()}.pyc"
+
     def get_code(self, full_name: str):
         source = self.get_source(full_name)
-        if source:
-            return compile(source, self.origin, "exec", dont_inherit=True)
-        return None
+        if not source:
+            return None
+
+        path = self.cache_path
+        code = load_bytecode(path)
+        if code is None:
+            code = compile(source, self.origin, "exec", dont_inherit=True)
+            store_bytecode(path, code)
+
+        return code
 
     def get_filename(self, _: str) -> str:
         return self.origin
@@ -116,16 +181,27 @@ class StringLoader(SourceLoader):
         return self.data
 
 
-def get_methods(cls, end: str, attribute: str = "") -> Dict[str, types.FunctionType]:
+def load_bytecode(path: Path) -> Optional[types.CodeType]:
     """
-    Collects methods from a class by suffix or attribute.
+    Reads a cached code object, ignoring caches from other Python versions
     """
-    methods = {}
-    for method_name in dir(cls):
-        method = getattr(cls, method_name)
-        if callable(method) and (
-            method_name.endswith(end) or hasattr(method, attribute)
-        ):
-            key = method_name.replace(end, "")
-            methods[key] = method
-    return methods
+    try:
+        data = path.read_bytes()
+        if data[: len(MAGIC_NUMBER)] != MAGIC_NUMBER:
+            return None
+
+        return marshal.loads(data[len(MAGIC_NUMBER) :])
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+
+
+def store_bytecode(path: Path, code: types.CodeType) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        temp_path.write_bytes(MAGIC_NUMBER + marshal.dumps(code))
+        os.replace(temp_path, path)
+    except OSError:
+        logging.debug("Failed to write bytecode cache %s", path, exc_info=True)
+
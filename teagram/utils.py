@@ -1,11 +1,20 @@
 from __future__ import annotations
 import os
+import re
+import sys
 import time
+import asyncio
+import hashlib
 import logging
 import random
+import shlex
 import string
-from typing import List, Optional, Union, Any
+import importlib.util
+from importlib import metadata
+from types import ModuleType
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Optional, Tuple, Union, Any
 from io import BytesIO, IOBase
+from pathlib import Path
 from enum import Enum
 from urllib.parse import urlparse
 from configparser import ConfigParser
@@ -13,16 +22,21 @@ from configparser import ConfigParser
 from pyrogram.types import Message
 from pyrogram.enums.parse_mode import ParseMode
 from teagram.client import CustomClient
-from aiogram import types
 from . import init_time
 
+if TYPE_CHECKING:
+    from aiogram import types
+
 FileLike = Optional[Union[BytesIO, IOBase, bytes, str]]
-InlineLike = Union[types.ChosenInlineResult, types.InlineQuery, types.CallbackQuery]
+InlineLike = Union[
+    "types.ChosenInlineResult", "types.InlineQuery", "types.CallbackQuery"
+]
 
 BASE_PATH = os.path.normpath(
     os.path.join(os.path.abspath(os.path.dirname(os.path.abspath(__file__))), "..")
 )
 LETTERS = string.ascii_letters + string.digits
+WHEEL_CACHE_PATH = os.path.join(BASE_PATH, ".cache", "wheels")
 
 
 class Parser(Enum):
@@ -54,6 +68,28 @@ class CommandParseResult:
         return f"<CommandParseResult prefix={self.prefix!r} command={self.command!r} args={self.args!r}>"
 
 
+def lazy_import(name: str) -> ModuleType:
+    """
+    Returns module `name` without executing it, the real import happens on
+    first attribute access. Raises `ImportError` right away if it's missing
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    return module
+
+
 def get_uptime() -> str:
     """Returns uptime as HH:MM:SS string."""
     current_time = time.time()
@@ -351,3 +387,112 @@ async def create_asset_group(
             return chat
 
     return await client.create_group(group_name, users=users)
+
+
+def is_package_installed(requirement: str) -> bool:
+    """Checks by distribution name only, version specifiers are ignored."""
+    name = re.split(r"[<>=!~\[;@ ]", requirement.strip(), maxsplit=1)[0]
+    try:
+        metadata.version(name)
+        return True
+    except metadata.PackageNotFoundError:
+        return False
+
+
+async def run_pip(
+    *args: str, progress: Optional[Callable[[str], Awaitable[Any]]] = None
+) -> int:
+    """Runs pip without blocking the event loop, streaming its output to `progress`."""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "pip",
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+
+    async for line in process.stdout:
+        line = line.decode(errors="replace").rstrip()
+        logging.debug(f"pip: {line}")
+        if progress and line:
+            await progress(line)
+
+    return await process.wait()
+
+
+async def install_packages(
+    requirements: Optional[List[str]] = None,
+    requirements_file: Optional[str] = None,
+    progress: Optional[Callable[[str], Awaitable[Any]]] = None,
+) -> bool:
+    """
+    Installs packages through a local wheel cache: an offline install is
+    tried first and the cache is only filled from the index on a miss.
+    VCS and URL requirements can't be resolved offline, they are installed
+    from the network after the rest
+    """
+    try:
+        targets, remote = split_requirements(requirements, requirements_file)
+    except OSError:
+        logging.exception(f"Failed to read {requirements_file}")
+        return False
+
+    if not (targets or remote):
+        return True
+
+    os.makedirs(WHEEL_CACHE_PATH, exist_ok=True)
+
+    install = ["install", "--find-links", WHEEL_CACHE_PATH]
+    if sys.prefix == sys.base_prefix:
+        install.append("--user")
+
+    if targets and await run_pip(*install, "--no-index", *targets, progress=progress):
+        # A failed build only leaves the cache cold, the install below
+        # still resolves everything from the index
+        await run_pip("wheel", "--wheel-dir", WHEEL_CACHE_PATH, *targets, progress=progress)
+
+        if await run_pip(*install, *targets, progress=progress):
+            return False
+
+    return not remote or await run_pip(*install, *remote, progress=progress) == 0
+
+
+def split_requirements(
+    requirements: Optional[List[str]] = None, requirements_file: Optional[str] = None
+) -> Tuple[List[str], List[str]]:
+    """
+    Splits requirements into pip arguments resolvable from the index and
+    VCS/URL requirements, comments of requirement files are dropped
+    """
+    if requirements_file:
+        with open(requirements_file, encoding="utf-8") as file:
+            requirements = [
+                re.sub(r"(^|\s)#.*", "", line).strip() for line in file
+            ]
+
+    targets, remote = [], []
+    for requirement in filter(None, requirements or []):
+        if requirement.startswith("-"):
+            targets.extend(shlex.split(requirement))
+        elif "://" in requirement or " @ " in requirement:
+            remote.append(requirement)
+        else:
+            targets.append(requirement)
+
+    return targets, remote
+
+
+def hash_sources(paths: list) -> dict:
+    """sha256 of every module file in `paths`, by path"""
+    hashes = {}
+    for path in paths:
+        for file_path in Path(path).glob("*.py"):
+            try:
+                digest = hashlib.sha256(file_path.read_bytes()).hexdigest()
+            except OSError:
+                continue
+
+            hashes[str(file_path)] = digest
+
+    return hashes
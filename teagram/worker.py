@@ -0,0 +1,334 @@
+import asyncio
+import inspect
+import logging
+import os
+import sys
+import traceback
+
+from importlib.util import spec_from_file_location, module_from_spec
+from typing import Any, Dict
+
+import ujson
+
+from .isolation import encode, decode
+from .translator import Translator, ModuleTranslator
+from .types import Module
+
+logger = logging.getLogger(__name__)
+
+
+class Channel:
+    """
+    JSON lines over stdio, stdout is moved to stderr so prints from the module
+    can't break the protocol
+    """
+
+    def __init__(self):
+        self._output = os.fdopen(os.dup(sys.stdout.fileno()), "wb", buffering=0)
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+
+    def send(self, payload: Dict[str, Any]) -> None:
+        self._output.write(ujson.dumps(payload).encode() + b"\n")
+
+    async def receive(self) -> Dict[str, Any]:
+        line = await asyncio.get_running_loop().run_in_executor(
+            None, sys.stdin.buffer.readline
+        )
+        if not line:
+            raise EOFError
+
+        return ujson.loads(line)
+
+    async def call(self, target: str, method: str, args: tuple, kwargs: dict) -> Any:
+        self._next_id += 1
+        call_id = self._next_id
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = future
+
+        self.send(
+            {
+                "type": "call",
+                "id": call_id,
+                "target": target,
+                "method": method,
+                "args": encode(args),
+                "kwargs": encode(kwargs),
+            }
+        )
+
+        try:
+            return await future
+        finally:
+            self._pending.pop(call_id, None)
+
+    def notify(self, target: str, method: str, args: tuple) -> None:
+        self.send(
+            {"type": "call", "target": target, "method": method, "args": encode(args)}
+        )
+
+    def resolve(self, payload: Dict[str, Any]) -> None:
+        future = self._pending.get(payload["id"])
+        if not future or future.done():
+            return
+
+        if payload.get("error"):
+            future.set_exception(RuntimeError(payload["error"]))
+        else:
+            future.set_result(decode(payload.get("result")))
+
+
+class RemoteObject:
+    def __init__(self, client: "RemoteClient", data: Dict[str, Any]):
+        self._client = client
+        self._data = data
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return wrap(self._client, self._data.get(name))
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self._data!r}>"
+
+
+class RemoteMessage(RemoteObject):
+    async def edit(self, text: str, **kwargs):
+        return await self._client.edit_message_text(self.chat.id, self.id, text, **kwargs)
+
+    async def reply(self, text: str, **kwargs):
+        kwargs.setdefault("reply_to_message_id", self.id)
+        return await self._client.send_message(self.chat.id, text, **kwargs)
+
+    async def delete(self):
+        return await self._client.delete_messages(self.chat.id, self.id)
+
+    edit_text = edit
+    reply_text = reply
+
+
+def wrap(client: "RemoteClient", value: Any) -> Any:
+    if isinstance(value, list):
+        return [wrap(client, v) for v in value]
+    if isinstance(value, dict):
+        if value.get("_") == "Message":
+            return RemoteMessage(client, value)
+
+        return RemoteObject(client, value)
+
+    return value
+
+
+class RemoteClient:
+    """Forwards every public method call to the main process's client"""
+
+    def __init__(self, channel: Channel, me: Dict[str, Any]):
+        self._channel = channel
+        self.me = wrap(self, me)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            return wrap(self, await self._channel.call("client", name, args, kwargs))
+
+        return call
+
+
+class RemoteDatabase:
+    """
+    Local copy of the module's section of the database, writes are sent to
+    the main process, which only accepts them for that section
+    """
+
+    def __init__(self, channel: Channel, data: Dict[str, Any], section: str):
+        self._channel = channel
+        self.data = data
+        self.section = section
+
+    def _check_section(self, section: str) -> None:
+        if section != self.section:
+            raise PermissionError(f"Section {section!r} is not available")
+
+    def get(self, section: str, key: str, default: Any = None) -> Any:
+        return self.data.get(section, {}).get(key, default)
+
+    def set(self, section: str, key: str, value: Any) -> None:
+        self._check_section(section)
+        self.data.setdefault(section, {})[key] = value
+        self._channel.notify("database", "set", (section, key, value))
+
+    def pop(self, section: str, key: str, default: Any = None) -> Any:
+        self._check_section(section)
+        value = self.data.get(section, {}).pop(key, default)
+        self._channel.notify("database", "pop", (section, key, default))
+
+        return value
+
+
+def apply_memory_limit() -> None:
+    limit = os.environ.get("TEAGRAM_WORKER_MEMORY")
+    if not limit:
+        return
+
+    try:
+        import resource
+
+        resource.setrlimit(resource.RLIMIT_AS, (int(limit), int(limit)))
+    except (ImportError, ValueError, OSError):
+        logger.warning("Failed to apply worker memory limit")
+
+
+def load_module(module_name: str, path: str, client: RemoteClient, database: RemoteDatabase) -> Module:
+    spec = spec_from_file_location(module_name, path)
+    module = module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+
+    instance = next(
+        value()
+        for value in vars(module).values()
+        if inspect.isclass(value)
+        and issubclass(value, Module)
+        and value.__module__ == module_name
+    )
+    instance.__origin__ = "<isolated>"
+    instance.client = client
+    instance.database = database
+    instance.inline = None
+
+    config_cls = getattr(instance, "Config", None)
+    if config_cls and hasattr(config_cls, "load"):
+        instance.config = config_cls.load(instance)
+
+    instance.load_init()
+    instance.translator = ModuleTranslator(
+        instance, Translator(database), getattr(instance, "strings", None)
+    )
+
+    return instance
+
+
+async def check_filter(instance: Module, func: Any, message: RemoteMessage) -> bool:
+    """Same check as the dispatcher's, done here as filters live in the worker"""
+    custom_filters = getattr(func, "_filters", None)
+    if not custom_filters:
+        return bool(
+            message.outgoing
+            or (message.from_user and message.from_user.id == instance.client.me.id)
+        )
+
+    result = custom_filters(message)
+    if inspect.isawaitable(result):
+        result = await result
+
+    return bool(result)
+
+
+async def run_command(channel: Channel, instance: Module, payload: Dict[str, Any]) -> None:
+    error = None
+    try:
+        func = instance.commands[payload["name"]]
+        message = RemoteMessage(instance.client, payload["message"])
+        user = payload["message"].get("from_user") or {}
+
+        if not await check_filter(instance, func, message):
+            return channel.send({"type": "done", "id": payload["id"], "error": None})
+
+        with instance.translator.translator.use(
+            payload["message"]["chat"]["id"], user.get("id")
+        ):
+            if len(inspect.getfullargspec(func).args) > 2:
+                await func(message, payload["args"])
+            else:
+                await func(message)
+    except Exception as exception:
+        error = "".join(traceback.format_exception(exception))
+
+    channel.send({"type": "done", "id": payload["id"], "error": error})
+
+
+async def run_watcher(instance: Module, payload: Dict[str, Any]) -> None:
+    message = RemoteMessage(instance.client, payload["message"])
+    watcher = instance.watchers[payload["index"]]
+    try:
+        if await check_filter(instance, watcher, message):
+            await watcher(message)
+    except Exception:
+        logger.exception("Error occurred while handling watcher")
+
+
+def describe_watcher(watcher: Any) -> Dict[str, Any]:
+    keywords = getattr(watcher, "keywords", None)
+    if isinstance(keywords, str):
+        keywords = [keywords]
+
+    return {
+        "chat_ids": list(getattr(watcher, "chat_ids", None) or []) or None,
+        "keywords": list(keywords or []) or None,
+        "filtered": bool(getattr(watcher, "_filters", None)),
+    }
+
+
+async def main(module_name: str, path: str) -> None:
+    channel = Channel()
+    init = await channel.receive()
+
+    apply_memory_limit()
+
+    client = RemoteClient(channel, init.get("me") or {})
+    database = RemoteDatabase(
+        channel, init.get("database") or {}, init.get("section") or module_name
+    )
+
+    instance = load_module(module_name, path, client, database)
+    await instance.on_load()
+
+    channel.send(
+        {
+            "type": "ready",
+            "class_name": instance.__class__.__name__,
+            "commands": {
+                name: {
+                    "aliases": (
+                        [func.alias] if isinstance(getattr(func, "alias", None), str)
+                        else list(getattr(func, "alias", None) or [])
+                    ),
+                    "doc": func.__doc__,
+                    "filtered": bool(getattr(func, "_filters", None)),
+                }
+                for name, func in instance.commands.items()
+            },
+            "watchers": [describe_watcher(watcher) for watcher in instance.watchers],
+        }
+    )
+
+    while True:
+        try:
+            payload = await channel.receive()
+        except EOFError:
+            break
+
+        kind = payload.get("type")
+        if kind == "command":
+            asyncio.create_task(run_command(channel, instance, payload))
+        elif kind == "watcher":
+            asyncio.create_task(run_watcher(instance, payload))
+        elif kind == "result":
+            channel.resolve(payload)
+
+    await instance.on_unload()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] worker %(name)s: %(message)s",
+    )
+
+    asyncio.run(main(sys.argv[1], sys.argv[2]))
@@ -0,0 +1,154 @@
+import importlib
+import logging
+import os
+import subprocess
+import sys
+import time
+
+# Exit codes used by children to ask the zygote for a new instance
+RESTART_EXIT_CODE = 75
+COLD_RESTART_EXIT_CODE = 76
+
+WARM_IMPORTS = [
+    "pyrogram",
+    "pyrogram.raw",
+    "pyrogram.types",
+    "aiogram",
+    "aiogram.types",
+    "aiohttp",
+    "git",
+    "psutil",
+    "yaml",
+    "ujson",
+    "colorlog",
+    "uvloop",
+    "tgcrypto",
+]
+
+
+def is_zygote_child() -> bool:
+    return "TEAGRAM_ZYGOTE" in os.environ
+
+
+def preload() -> None:
+    for name in WARM_IMPORTS:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logging.debug(f"Zygote couldn't preload {name}")
+
+
+def purge_teagram() -> None:
+    """
+    Forgets teagram's own modules inherited from the zygote, so the next
+    import reads them from disk again
+    """
+    for name in list(sys.modules):
+        if name == "teagram" or name.startswith("teagram."):
+            del sys.modules[name]
+
+
+class Zygote:
+    """
+    Imports heavy dependencies once and forks every userbot instance from
+    itself. Teagram's own code is only imported in children, so they always
+    run the sources currently on disk
+    """
+
+    def __init__(self, arguments):
+        self.arguments = arguments
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid:
+            return pid
+
+        # Child: reset uptime and run the userbot from freshly imported sources
+        purge_teagram()
+        importlib.invalidate_caches()
+
+        import teagram
+
+        teagram.init_time = time.time()
+        os.environ["TEAGRAM_ZYGOTE"] = str(os.getppid())
+
+        from .main import Main
+
+        code = 0
+        try:
+            Main(self.arguments).start()
+        except SystemExit as error:
+            code = error.code if isinstance(error.code, int) else 0
+        except BaseException:
+            logging.exception("Userbot crashed")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def run(self) -> None:
+        if not hasattr(os, "fork"):
+            logging.warning("Zygote mode needs os.fork, starting normally")
+
+            from .main import Main
+
+            return Main(self.arguments).start()
+
+        preload()
+
+        while True:
+            pid = self.spawn()
+            try:
+                _, status = os.waitpid(pid, 0)
+            except KeyboardInterrupt:
+                _, status = os.waitpid(pid, 0)
+
+            code = os.waitstatus_to_exitcode(status)
+            if code == RESTART_EXIT_CODE:
+                logging.info("Restarting from warm zygote...")
+                continue
+
+            if code == COLD_RESTART_EXIT_CODE:
+                logging.info("Dependencies changed, restarting zygote...")
+                os.execl(
+                    sys.executable, sys.executable, "-m", "teagram", *sys.argv[1:]
+                )
+
+            sys.exit(code if code >= 0 else 1)
+
+
+def benchmark_imports(rounds: int = 5) -> None:
+    """
+    Compares time until `teagram.main` is imported for a cold interpreter and
+    for a child forked from a warm zygote. Connecting and loading modules
+    take the same time either way and aren't measured
+    """
+    command = [sys.executable, "-c", "import teagram.main"]
+
+    cold = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        subprocess.run(command, check=True)
+        cold.append(time.perf_counter() - start)
+
+    preload()
+
+    warm = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        pid = os.fork()
+        if not pid:
+            try:
+                purge_teagram()
+                import teagram.main  # noqa: F401
+            finally:
+                os._exit(0)
+
+        os.waitpid(pid, 0)
+        warm.append(time.perf_counter() - start)
+
+    print(f"cold import: {min(cold) * 1000:.1f}ms (best of {rounds})")
+    print(f"fork import: {min(warm) * 1000:.1f}ms (best of {rounds})")
+
+
+if __name__ == "__main__":
+    benchmark_imports()